@@ -1,33 +1,38 @@
 #!/usr/bin/env python3
 """
-Script para analizar dataset CSV y generar métricas descriptivas y de ML
+Script para analizar dataset CSV y generar métricas descriptivas y de ML.
+
+pandas se importa al analizar y sklearn/xgboost solo si hay que entrenar el modelo.
 """
 
-import pandas as pd
 import numpy as np
 import json
 import sys
 import os
+import time
 from datetime import datetime
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.metrics import (
-    accuracy_score, precision_score, recall_score, f1_score, 
-    roc_auc_score, confusion_matrix, classification_report
-)
-import xgboost as xgb
 import warnings
+from profiling import Profiler
+from dataset_io import read_dataset, dataset_hash, drop_incomplete_rows
+from data_quality import profile_dataframe
+from churn_pipeline import FEATURE_COLUMNS, REQUIRED_COLUMNS, detect_target_column, target_values
+from xgboost_churn import CustomerChurnPredictor, has_cross_validation, parse_options
 warnings.filterwarnings('ignore')
 
 class DatasetAnalyzer:
-    def __init__(self):
+    def __init__(self, cv_folds=None):
         self.df = None
+        self.cv_folds = cv_folds
+        self.dataset_hash = None
         self.metrics = {}
+        self.profiler = Profiler()
         
     def load_data(self, csv_path):
         """Cargar CSV"""
         try:
-            self.df = pd.read_csv(csv_path, low_memory=False)
+            with self.profiler.phase('load'):
+                self.dataset_hash = dataset_hash(csv_path)
+                self.df = read_dataset(csv_path)
             print(f"[INFO] Archivo cargado: {len(self.df)} registros")
             return True
         except Exception as e:
@@ -36,154 +41,98 @@ class DatasetAnalyzer:
     
     def analyze(self):
         """Analizar dataset completo"""
+        import pandas as pd
+        
         if self.df is None:
             return None
         
         try:
             # Métricas básicas del dataset
-            total_records = len(self.df)
+            with self.profiler.phase('resumen'):
+                total_records = len(self.df)
             
-            # Analizar columna de fuga/deserción
-            fuga_col = None
-            for col in ['fuga', 'desercion', 'churn', 'cliente_activo']:
-                if col in self.df.columns:
-                    fuga_col = col
-                    break
+                # Analizar columna de fuga/deserción
+                fuga_col = detect_target_column(self.df)
             
-            if fuga_col:
-                if fuga_col == 'cliente_activo':
-                    # Invertir (0 = activo, 1 = fugó)
-                    fuga_values = (self.df[fuga_col] == 0).astype(int)
-                else:
-                    fuga_values = self.df[fuga_col].astype(int)
+                if fuga_col:
+                    # 'cliente_activo' se invierte (0 = activo, 1 = fugó)
+                    fuga_values = target_values(self.df, fuga_col)
                 
-                fuga_count = fuga_values.sum()
-                no_fuga_count = total_records - fuga_count
-                fuga_percentage = (fuga_count / total_records * 100) if total_records > 0 else 0
-            else:
-                fuga_count = 0
-                no_fuga_count = total_records
-                fuga_percentage = 0
+                    fuga_count = fuga_values.sum()
+                    no_fuga_count = total_records - fuga_count
+                    fuga_percentage = (fuga_count / total_records * 100) if total_records > 0 else 0
+                else:
+                    fuga_count = 0
+                    no_fuga_count = total_records
+                    fuga_percentage = 0
             
-            # Análisis demográfico
-            demographic_analysis = {}
+                # Análisis demográfico
+                demographic_analysis = {}
             
-            # Edad
-            if 'edad' in self.df.columns:
-                demographic_analysis['edad'] = {
-                    'promedio': float(self.df['edad'].mean()),
-                    'mediana': float(self.df['edad'].median()),
-                    'minimo': int(self.df['edad'].min()),
-                    'maximo': int(self.df['edad'].max()),
-                    'desviacion_std': float(self.df['edad'].std())
-                }
+                # Edad
+                if 'edad' in self.df.columns:
+                    edad = self._numeric_summary('edad')
+                    edad['minimo'] = int(edad['minimo'])
+                    edad['maximo'] = int(edad['maximo'])
+                    demographic_analysis['edad'] = edad
             
-            # Ingresos
-            if 'ingresos_mensuales' in self.df.columns:
-                demographic_analysis['ingresos_mensuales'] = {
-                    'promedio': float(self.df['ingresos_mensuales'].mean()),
-                    'mediana': float(self.df['ingresos_mensuales'].median()),
-                    'minimo': float(self.df['ingresos_mensuales'].min()),
-                    'maximo': float(self.df['ingresos_mensuales'].max()),
-                    'desviacion_std': float(self.df['ingresos_mensuales'].std())
-                }
+                # Ingresos
+                if 'ingresos_mensuales' in self.df.columns:
+                    demographic_analysis['ingresos_mensuales'] = self._numeric_summary('ingresos_mensuales')
             
             # Análisis por categorías
-            categorical_analysis = {}
-            categorical_columns = ['sexo', 'estado_civil', 'nacionalidad', 
-                                 'nivel_educativo', 'ocupacion', 
-                                 'nivel_riesgo_crediticio', 'tarjeta_credito']
+            with self.profiler.phase('categorico'):
+                categorical_analysis = {}
+                categorical_columns = ['sexo', 'estado_civil', 'nacionalidad', 
+                                     'nivel_educativo', 'ocupacion', 
+                                     'nivel_riesgo_crediticio', 'tarjeta_credito']
             
-            for col in categorical_columns:
-                if col in self.df.columns:
-                    value_counts = self.df[col].value_counts().to_dict()
-                    categorical_analysis[col] = {
-                        'distribucion': value_counts,
-                        'categorias_unicas': int(self.df[col].nunique())
-                    }
+                # Indicador de fuga por fila, compartido por todas las agregaciones
+                if fuga_col == 'cliente_activo':
+                    churn_flags = (self.df[fuga_col] == 0)
+                elif fuga_col:
+                    churn_flags = self.df[fuga_col]
+            
+                for col in categorical_columns:
+                    if col in self.df.columns:
+                        value_counts = self.df[col].value_counts().to_dict()
+                        categorical_analysis[col] = {
+                            'distribucion': value_counts,
+                            'categorias_unicas': int(self.df[col].nunique())
+                        }
                     
-                    # Tasa de fuga por categoría
-                    if fuga_col:
-                        fuga_by_category = {}
-                        for category in self.df[col].unique():
-                            mask = self.df[col] == category
-                            total_cat = mask.sum()
-                            if fuga_col == 'cliente_activo':
-                                fuga_cat = ((self.df[mask][fuga_col] == 0).sum())
-                            else:
-                                fuga_cat = self.df[mask][fuga_col].sum()
-                            fuga_rate = (fuga_cat / total_cat * 100) if total_cat > 0 else 0
-                            fuga_by_category[str(category)] = {
-                                'total': int(total_cat),
-                                'con_fuga': int(fuga_cat),
-                                'tasa_fuga': float(fuga_rate)
-                            }
-                        categorical_analysis[col]['tasa_fuga_por_categoria'] = fuga_by_category
-            
-            # Análisis de calidad de datos
-            quality_analysis = {
-                'registros_completos': int(self.df.dropna().shape[0]),
-                'registros_con_nulos': int(self.df.isnull().any(axis=1).sum()),
-                'columnas_totales': len(self.df.columns),
-                'valores_nulos_por_columna': {}
-            }
+                        # Tasa de fuga por categoría
+                        if fuga_col:
+                            fuga_by_category = self._churn_by_group(self.df[col], churn_flags)
+                            categorical_analysis[col]['tasa_fuga_por_categoria'] = fuga_by_category
             
-            for col in self.df.columns:
-                null_count = int(self.df[col].isnull().sum())
-                if null_count > 0:
-                    quality_analysis['valores_nulos_por_columna'][col] = {
-                        'nulos': null_count,
-                        'porcentaje': float((null_count / total_records) * 100)
-                    }
+            # Análisis de calidad de datos: una pasada por columna con su máscara de nulos
+            with self.profiler.phase('calidad'):
+                quality_analysis = profile_dataframe(self.df)
             
             # Segmentación de clientes (si hay fuga)
-            segmentation = {}
-            if fuga_col:
-                # Por edad
-                if 'edad' in self.df.columns:
-                    bins = [0, 25, 35, 45, 55, 65, 100]
-                    labels = ['18-25', '26-35', '36-45', '46-55', '56-65', '65+']
-                    self.df['edad_grupo'] = pd.cut(self.df['edad'], bins=bins, labels=labels)
+            with self.profiler.phase('segmentacion'):
+                segmentation = {}
+                if fuga_col:
+                    # Por edad
+                    if 'edad' in self.df.columns:
+                        bins = [0, 25, 35, 45, 55, 65, 100]
+                        labels = ['18-25', '26-35', '36-45', '46-55', '56-65', '65+']
+                        self.df['edad_grupo'] = pd.cut(self.df['edad'], bins=bins, labels=labels)
                     
-                    age_segment = {}
-                    for age_group in labels:
-                        mask = self.df['edad_grupo'] == age_group
-                        total = mask.sum()
-                        if total > 0:
-                            if fuga_col == 'cliente_activo':
-                                fuga_segment = (self.df[mask][fuga_col] == 0).sum()
-                            else:
-                                fuga_segment = self.df[mask][fuga_col].sum()
-                            age_segment[age_group] = {
-                                'total': int(total),
-                                'con_fuga': int(fuga_segment),
-                                'tasa_fuga': float((fuga_segment / total) * 100)
-                            }
-                    segmentation['por_edad'] = age_segment
+                        age_segment = self._churn_by_group(self.df['edad_grupo'], churn_flags, labels)
+                        segmentation['por_edad'] = age_segment
                 
-                # Por ingresos
-                if 'ingresos_mensuales' in self.df.columns:
-                    income_bins = [0, 2000, 5000, 10000, 20000, float('inf')]
-                    income_labels = ['Bajo', 'Medio-Bajo', 'Medio', 'Medio-Alto', 'Alto']
-                    self.df['ingreso_grupo'] = pd.cut(self.df['ingresos_mensuales'], 
-                                                       bins=income_bins, 
-                                                       labels=income_labels)
+                    # Por ingresos
+                    if 'ingresos_mensuales' in self.df.columns:
+                        income_bins = [0, 2000, 5000, 10000, 20000, float('inf')]
+                        income_labels = ['Bajo', 'Medio-Bajo', 'Medio', 'Medio-Alto', 'Alto']
+                        self.df['ingreso_grupo'] = pd.cut(self.df['ingresos_mensuales'], 
+                                                           bins=income_bins, 
+                                                           labels=income_labels)
                     
-                    income_segment = {}
-                    for income_group in income_labels:
-                        mask = self.df['ingreso_grupo'] == income_group
-                        total = mask.sum()
-                        if total > 0:
-                            if fuga_col == 'cliente_activo':
-                                fuga_segment = (self.df[mask][fuga_col] == 0).sum()
-                            else:
-                                fuga_segment = self.df[mask][fuga_col].sum()
-                            income_segment[income_group] = {
-                                'total': int(total),
-                                'con_fuga': int(fuga_segment),
-                                'tasa_fuga': float((fuga_segment / total) * 100)
-                            }
-                    segmentation['por_ingresos'] = income_segment
+                        income_segment = self._churn_by_group(self.df['ingreso_grupo'], churn_flags, income_labels)
+                        segmentation['por_ingresos'] = income_segment
             
             # Construir métricas finales
             self.metrics = {
@@ -205,13 +154,17 @@ class DatasetAnalyzer:
             }
             
             # Agregar métricas de ML
-            ml_metrics = self.calculate_ml_metrics()
+            with self.profiler.phase('ml_metrics'):
+                ml_metrics = self.calculate_ml_metrics(self.cv_folds)
             if ml_metrics:
                 self.metrics['metricas_ml'] = ml_metrics
                 print("[SUCCESS] Métricas ML agregadas al análisis")
             else:
                 print("[WARNING] Métricas ML no disponibles")
             
+            if self.profiler.enabled:
+                self.metrics['profiling'] = self.profiler.report()
+            
             return self.metrics
             
         except Exception as e:
@@ -220,8 +173,53 @@ class DatasetAnalyzer:
             traceback.print_exc()
             return None
     
-    def calculate_ml_metrics(self):
-        """Entrenar modelo rápido y calcular métricas de ML"""
+    def _numeric_summary(self, col):
+        """Estadísticas descriptivas de una columna numérica compacta"""
+        series = self.df[col]
+        # Los tipos compactos (float32/int16) se acumulan en doble precisión
+        values = series.astype('float64')
+        
+        def exact(value):
+            # Un valor float32 del CSV se reporta con su representación decimal más corta
+            if series.dtype == np.float32:
+                return float(str(np.float32(value)))
+            return float(value)
+        
+        return {
+            'promedio': float(values.mean()),
+            'mediana': exact(values.median()),
+            'minimo': exact(series.min()),
+            'maximo': exact(series.max()),
+            'desviacion_std': float(values.std())
+        }
+    
+    def _churn_by_group(self, group_keys, churn_flags, order=None):
+        """Total, clientes con fuga y tasa de fuga por grupo en una sola agregación"""
+        import pandas as pd
+        
+        grouped = churn_flags.groupby(group_keys, sort=False, observed=True, dropna=order is not None)
+        grouped = grouped.agg(['size', 'sum'])
+        if order is not None:
+            # Segmentos: orden fijo de etiquetas, omitiendo los vacíos
+            grouped = grouped.reindex([label for label in order if label in grouped.index])
+        
+        result = {}
+        for category, total, fuga in zip(grouped.index, grouped['size'], grouped['sum']):
+            if pd.isna(category):
+                # Un valor nulo nunca coincide por igualdad: se reporta como grupo vacío
+                total, fuga = 0, 0
+            result[str(category)] = {
+                'total': int(total),
+                'con_fuga': int(fuga),
+                'tasa_fuga': float((fuga / total) * 100) if total > 0 else 0.0
+            }
+        return result
+    
+    def calculate_ml_metrics(self, cv_folds=None):
+        """
+        Calcular métricas de ML reutilizando el modelo entrenado para este dataset.
+        Con cv_folds se añade una validación cruzada estratificada en ese número de folds.
+        """
         if self.df is None:
             return None
         
@@ -229,183 +227,51 @@ class DatasetAnalyzer:
             print("\n[ML] Calculando métricas de Machine Learning...")
             
             # Detectar columna de fuga
-            fuga_col = None
-            for col in ['fuga', 'desercion', 'churn', 'cliente_activo']:
-                if col in self.df.columns:
-                    fuga_col = col
-                    break
+            fuga_col = detect_target_column(self.df)
             
             if not fuga_col:
                 print("[WARNING] No se encontró columna de fuga. Métricas ML no disponibles.")
                 return None
             
-            # Preparar datos
-            df_ml = self.df.copy()
-            
-            # Variable objetivo
-            if fuga_col == 'cliente_activo':
-                y = (df_ml[fuga_col] == 0).astype(int)
-            else:
-                y = df_ml[fuga_col].astype(int)
-            
-            # Features
-            feature_columns = ['edad', 'sexo', 'estado_civil', 'nacionalidad',
-                             'nivel_educativo', 'ingresos_mensuales', 'ocupacion',
-                             'nivel_riesgo_crediticio', 'tarjeta_credito']
-            
             # Verificar que existan las columnas
-            available_features = [col for col in feature_columns if col in df_ml.columns]
+            available_features = [col for col in FEATURE_COLUMNS if col in self.df.columns]
             if len(available_features) < 5:
                 print(f"[WARNING] Pocas features disponibles ({len(available_features)}). Métricas ML no confiables.")
                 return None
             
-            X = df_ml[available_features].copy()
-            
-            # Codificar variables categóricas
-            encoders = {}
-            categorical_columns = ['sexo', 'estado_civil', 'nacionalidad', 
-                                 'nivel_educativo', 'ocupacion', 
-                                 'nivel_riesgo_crediticio', 'tarjeta_credito']
-            
-            for col in categorical_columns:
-                if col in X.columns:
-                    encoders[col] = LabelEncoder()
-                    X[col] = encoders[col].fit_transform(X[col].astype(str))
+            predictor = CustomerChurnPredictor(profiler=self.profiler)
             
-            # Escalar features numéricas
-            scaler = StandardScaler()
-            numerical_features = ['edad', 'ingresos_mensuales']
-            for col in numerical_features:
-                if col in X.columns:
-                    X[col] = scaler.fit_transform(X[[col]])
-            
-            # Dividir datos
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=0.2, random_state=42, stratify=y
-            )
-            
-            print(f"[ML] Entrenando modelo con {len(X_train)} registros de entrenamiento...")
-            
-            # Entrenar modelo XGBoost (configuración rápida)
-            model = xgb.XGBClassifier(
-                n_estimators=50,      # Más árboles que la versión ultra-rápida
-                max_depth=4,
-                learning_rate=0.1,
-                subsample=0.8,
-                colsample_bytree=0.8,
-                random_state=42,
-                verbosity=0,
-                n_jobs=-1,
-                eval_metric='logloss'
-            )
-            
-            model.fit(X_train, y_train)
-            
-            print("[ML] Modelo entrenado. Calculando métricas...")
-            
-            # Predicciones
-            y_pred = model.predict(X_test)
-            y_proba = model.predict_proba(X_test)[:, 1]
-            
-            # Métricas básicas
-            accuracy = accuracy_score(y_test, y_pred)
-            precision = precision_score(y_test, y_pred, zero_division=0)
-            recall = recall_score(y_test, y_pred, zero_division=0)
-            f1 = f1_score(y_test, y_pred, zero_division=0)
-            
-            # ROC-AUC (solo si hay ambas clases)
-            try:
-                roc_auc = roc_auc_score(y_test, y_proba)
-            except:
-                roc_auc = 0.0
-            
-            # Matriz de confusión
-            cm = confusion_matrix(y_test, y_pred)
-            if cm.size == 4:
-                tn, fp, fn, tp = cm.ravel()
+            # Modelo y métricas de 'train' (o de un análisis previo) para el mismo dataset
+            metrics = predictor.load_dataset_metrics(self.dataset_hash)
+            if metrics is not None and not has_cross_validation(metrics, cv_folds):
+                metrics = None
+            if metrics is not None:
+                print(f"[ML] Reutilizando modelo ya entrenado para el dataset {self.dataset_hash}")
             else:
-                tn, fp, fn, tp = 0, 0, 0, 0
-            
-            # Métricas adicionales
-            specificity = tn / (tn + fp) if (tn + fp) > 0 else 0
-            sensitivity = recall
-            fpr = fp / (fp + tn) if (fp + tn) > 0 else 0
-            fnr = fn / (fn + tp) if (fn + tp) > 0 else 0
+                start_time = time.time()
+                
+                # Con el esquema completo de entrenamiento se preprocesa igual que 'train',
+                # de modo que el modelo resultante pueda ser adoptado por él
+                # (fit_dataframe no modifica el DataFrame: no hace falta copiarlo)
+                adoptable = all(col in self.df.columns for col in REQUIRED_COLUMNS)
+                df_ml = drop_incomplete_rows(self.df, REQUIRED_COLUMNS if adoptable else [fuga_col])
+                y = target_values(df_ml, fuga_col)
+                
+                print(f"[ML] Entrenando modelo con {len(df_ml)} registros...")
+                metrics = predictor.fit_dataframe(df_ml, available_features, y)
+                if cv_folds:
+                    metrics['cross_validation'] = predictor.cross_validate(df_ml, available_features, cv_folds, y)
+                metrics['training_time'] = float(time.time() - start_time)
+                
+                if adoptable and self.dataset_hash:
+                    metrics['dataset_hash'] = self.dataset_hash
+                    predictor.save_dataset_artifacts(self.dataset_hash, metrics)
             
-            # Classification report
-            class_report = classification_report(y_test, y_pred, output_dict=True, zero_division=0)
+            ml_metrics = self._format_ml_metrics(metrics)
             
-            # Feature importance
-            feature_importance = dict(zip(available_features, model.feature_importances_.tolist()))
-            
-            # Métricas por clase
-            metrics_by_class = {
-                '0': {
-                    'precision': float(class_report['0']['precision']),
-                    'recall': float(class_report['0']['recall']),
-                    'f1-score': float(class_report['0']['f1-score']),
-                    'support': int(class_report['0']['support'])
-                },
-                '1': {
-                    'precision': float(class_report['1']['precision']),
-                    'recall': float(class_report['1']['recall']),
-                    'f1-score': float(class_report['1']['f1-score']),
-                    'support': int(class_report['1']['support'])
-                }
-            }
-            
-            ml_metrics = {
-                'metricas_principales': {
-                    'accuracy': float(accuracy),
-                    'precision': float(precision),
-                    'recall': float(recall),
-                    'f1_score': float(f1),
-                    'roc_auc': float(roc_auc)
-                },
-                'matriz_confusion': {
-                    'true_negative': int(tn),
-                    'false_positive': int(fp),
-                    'false_negative': int(fn),
-                    'true_positive': int(tp),
-                    'visual': {
-                        'predicho_no_fuga': {
-                            'real_no_fuga': int(tn),
-                            'real_fuga': int(fn)
-                        },
-                        'predicho_fuga': {
-                            'real_no_fuga': int(fp),
-                            'real_fuga': int(tp)
-                        }
-                    }
-                },
-                'metricas_avanzadas': {
-                    'specificity': float(specificity),
-                    'sensitivity': float(sensitivity),
-                    'false_positive_rate': float(fpr),
-                    'false_negative_rate': float(fnr),
-                    'balanced_accuracy': float((sensitivity + specificity) / 2)
-                },
-                'metricas_por_clase': metrics_by_class,
-                'feature_importance': feature_importance,
-                'datos_entrenamiento': {
-                    'total_train': len(X_train),
-                    'total_test': len(X_test),
-                    'features_utilizadas': available_features,
-                    'fuga_train': int(y_train.sum()),
-                    'fuga_test': int(y_test.sum()),
-                    'balance_train': {
-                        'no_fuga': int((y_train == 0).sum()),
-                        'fuga': int((y_train == 1).sum())
-                    },
-                    'balance_test': {
-                        'no_fuga': int((y_test == 0).sum()),
-                        'fuga': int((y_test == 1).sum())
-                    }
-                },
-                'interpretacion': self._generate_interpretation(accuracy, precision, recall, f1, roc_auc)
-            }
-            
-            print(f"[ML] Métricas calculadas - Accuracy: {accuracy*100:.2f}%, F1-Score: {f1*100:.2f}%")
+            principales = ml_metrics['metricas_principales']
+            print(f"[ML] Métricas calculadas - Accuracy: {principales['accuracy']*100:.2f}%, "
+                  f"F1-Score: {principales['f1_score']*100:.2f}%")
             
             return ml_metrics
             
@@ -415,6 +281,114 @@ class DatasetAnalyzer:
             traceback.print_exc()
             return None
     
+    def _format_ml_metrics(self, metrics):
+        """Traducir las métricas del pipeline de entrenamiento al esquema del análisis"""
+        accuracy = metrics['accuracy']
+        precision = metrics['precision']
+        recall = metrics['recall']
+        f1 = metrics['f1_score']
+        roc_auc = metrics['roc_auc']
+        
+        cm = metrics['confusion_matrix']
+        tn, fp = cm['true_negative'], cm['false_positive']
+        fn, tp = cm['false_negative'], cm['true_positive']
+        
+        # Métricas adicionales
+        specificity = metrics['additional_metrics']['specificity']
+        sensitivity = recall
+        
+        # Métricas por clase (el soporte sale de la matriz de confusión)
+        support = {'0': tn + fp, '1': fn + tp}
+        metrics_by_class = {}
+        for label, report in metrics['classification_report'].items():
+            metrics_by_class[label] = {
+                'precision': float(report['precision']),
+                'recall': float(report['recall']),
+                'f1-score': float(report['f1-score']),
+                'support': int(support[label])
+            }
+        
+        split = metrics['data_split']
+        
+        ml_metrics = {
+            'metricas_principales': {
+                'accuracy': float(accuracy),
+                'precision': float(precision),
+                'recall': float(recall),
+                'f1_score': float(f1),
+                'roc_auc': float(roc_auc)
+            },
+            'matriz_confusion': {
+                'true_negative': int(tn),
+                'false_positive': int(fp),
+                'false_negative': int(fn),
+                'true_positive': int(tp),
+                'visual': {
+                    'predicho_no_fuga': {
+                        'real_no_fuga': int(tn),
+                        'real_fuga': int(fn)
+                    },
+                    'predicho_fuga': {
+                        'real_no_fuga': int(fp),
+                        'real_fuga': int(tp)
+                    }
+                }
+            },
+            'metricas_avanzadas': {
+                'specificity': float(specificity),
+                'sensitivity': float(sensitivity),
+                'false_positive_rate': float(metrics['additional_metrics']['false_positive_rate']),
+                'false_negative_rate': float(metrics['additional_metrics']['false_negative_rate']),
+                'balanced_accuracy': float((sensitivity + specificity) / 2)
+            },
+            'metricas_por_clase': metrics_by_class,
+            'feature_importance': metrics['feature_importance'],
+            'datos_entrenamiento': {
+                'total_train': split['train_size'],
+                'total_validacion': split.get('validation_size', 0),
+                'total_test': split['test_size'],
+                'features_utilizadas': metrics['feature_columns'],
+                'fuga_train': split['train_churn'],
+                'fuga_test': split['test_churn'],
+                'balance_train': {
+                    'no_fuga': split['train_size'] - split['train_churn'],
+                    'fuga': split['train_churn']
+                },
+                'balance_test': {
+                    'no_fuga': split['test_size'] - split['test_churn'],
+                    'fuga': split['test_churn']
+                }
+            },
+            'interpretacion': self._generate_interpretation(accuracy, precision, recall, f1, roc_auc)
+        }
+        
+        # Umbral de decisión y cortes de riesgo calibrados con el barrido de umbrales
+        threshold_analysis = metrics.get('threshold_analysis')
+        if threshold_analysis:
+            thresholds = threshold_analysis['thresholds']
+            ml_metrics['umbrales'] = {
+                'calibrados': threshold_analysis['calibrated'],
+                'decision': thresholds['decision'],
+                'riesgo_alto': thresholds['risk_high'],
+                'riesgo_medio': thresholds['risk_medium'],
+                'punto_operacion': threshold_analysis.get('operating_point'),
+                'curva': threshold_analysis.get('curve'),
+                # Partición usada para calibrar y métricas de test con los umbrales desplegados
+                'particion_calibracion': threshold_analysis.get('calibration_split'),
+                'test_en_umbrales': threshold_analysis.get('test_at_thresholds')
+            }
+        
+        # Validación cruzada: media y desviación típica de cada métrica entre folds
+        cross_validation = metrics.get('cross_validation')
+        if cross_validation:
+            ml_metrics['validacion_cruzada'] = {
+                'folds': cross_validation['folds'],
+                'media': cross_validation['mean'],
+                'desviacion_estandar': cross_validation['std'],
+                'por_fold': cross_validation['per_fold']
+            }
+        return ml_metrics
+    
     def _generate_interpretation(self, accuracy, precision, recall, f1, roc_auc):
         """Generar interpretación de las métricas"""
         interpretation = {
@@ -503,6 +477,8 @@ class DatasetAnalyzer:
     
     def _convert_to_native_types(self, obj):
         """Convertir tipos de NumPy/Pandas a tipos nativos de Python"""
+        import pandas as pd
+        
         if isinstance(obj, dict):
             return {key: self._convert_to_native_types(value) for key, value in obj.items()}
         elif isinstance(obj, list):
@@ -544,14 +520,21 @@ class DatasetAnalyzer:
         print("\n" + "="*60)
 
 def main():
-    if len(sys.argv) < 2:
-        print("Uso: python analyze_dataset.py <csv_path> [output_json]")
+    try:
+        args, options = parse_options(sys.argv[1:])
+        cv_folds = int(options['cv']) if 'cv' in options else None
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
+    
+    if len(args) < 1 or (cv_folds is not None and cv_folds < 2):
+        print("Uso: python analyze_dataset.py <csv_path> [output_json] [--cv K]")
         sys.exit(1)
     
-    csv_path = sys.argv[1]
-    output_path = sys.argv[2] if len(sys.argv) > 2 else 'dataset_metrics.json'
+    csv_path = args[0]
+    output_path = args[1] if len(args) > 1 else 'dataset_metrics.json'
     
-    analyzer = DatasetAnalyzer()
+    analyzer = DatasetAnalyzer(cv_folds)
     
     if not analyzer.load_data(csv_path):
         sys.exit(1)
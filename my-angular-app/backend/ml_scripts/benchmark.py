@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los puntos de entrada de ML con datasets sintéticos de varias escalas.
+
+Uso:
+    python benchmark.py [--sizes 10k,1m,10m] [--output benchmark_results.json] [--work-dir dir]
+
+Cada medición corre en un subproceso aislado (con su propio directorio de modelos
+y de caché) para reportar tiempo, throughput y RSS pico comparables entre commits.
+Antes de las escalas se mide el arranque en frío de cada comando con -X importtime.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Escalas por defecto del benchmark
+DEFAULT_SIZES = ['10k', '1m', '10m']
+
+# Filas generadas por bloque al escribir el CSV sintético
+GENERATION_CHUNK_ROWS = 1000000
+
+# Predicciones individuales para medir latencia
+SINGLE_PREDICTIONS = 500
+
+# Filas del dataset usado para medir el arranque de los comandos
+STARTUP_ROWS = 2000
+
+# Filas del dataset comparadas entre la predicción individual y la de lotes
+PARITY_ROWS = 20000
+
+# Diferencia máxima (en ulps de float32) tolerada entre probabilidades de dos caminos:
+# con el mismo margen, la expf de cada implementación puede diferir en la última cifra
+PARITY_MAX_ULP = 4
+
+# Dependencias pesadas cuya importación se reporta por comando
+HEAVY_MODULES = ['pandas', 'sklearn', 'xgboost', 'pyarrow']
+
+# Esquema exacto que espera load_and_preprocess_data
+CATEGORY_VALUES = {
+    'sexo': (['F', 'M'], [0.5, 0.5]),
+    'estado_civil': (['C', 'D', 'V', 'S'], [0.26, 0.25, 0.25, 0.24]),
+    'nacionalidad': (['VE', 'PE', 'UR', 'CO', 'AR'], [0.21, 0.2, 0.2, 0.2, 0.19]),
+    'nivel_educativo': (['TEC', 'NIN', 'UNI'], [0.34, 0.33, 0.33]),
+    'ocupacion': (['EMP', 'DESEMP'], [0.85, 0.15]),
+    'nivel_riesgo_crediticio': (['RM', 'RB', 'RA', 'RMB'], [0.5, 0.2, 0.2, 0.1]),
+    'tarjeta_credito': (['S', 'N'], [0.6, 0.4])
+}
+
+SAMPLE_CUSTOMER = {
+    'edad': 40, 'sexo': 'F', 'estado_civil': 'C', 'nacionalidad': 'PE',
+    'nivel_educativo': 'UNI', 'ingresos_mensuales': 3000, 'ocupacion': 'DESEMP',
+    'nivel_riesgo_crediticio': 'RA', 'tarjeta_credito': 'S'
+}
+
+
+def parse_size(label):
+    """'10k' -> 10000, '1m' -> 1000000"""
+    label = label.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(label[-1], 1)
+    number = label[:-1] if label[-1] in 'km' else label
+    return int(float(number) * multiplier)
+
+
+def generate_dataset(csv_path, rows, seed=42):
+    """
+    Escribir un CSV sintético con el esquema de clientes, por bloques para no
+    depender de la memoria disponible
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    written = 0
+    with open(csv_path, 'w', encoding='utf-8', newline='') as out:
+        while written < rows:
+            n = min(GENERATION_CHUNK_ROWS, rows - written)
+            df = pd.DataFrame({'ClienteID': np.arange(written + 1, written + n + 1)})
+            df['edad'] = rng.integers(18, 80, n)
+            for col, (values, probabilities) in CATEGORY_VALUES.items():
+                df[col] = rng.choice(values, n, p=probabilities)
+            df['ingresos_mensuales'] = rng.gamma(2.0, 2500.0, n).round(2)
+
+            # Fuga con relación real a las features para que el modelo aprenda algo
+            logit = (-2.2 + 0.9 * (df['ocupacion'] == 'DESEMP') + 0.7 * (df['nivel_riesgo_crediticio'] == 'RA')
+                     + 0.02 * (df['edad'] - 45) - 0.00008 * df['ingresos_mensuales'])
+            df['fuga'] = (rng.random(n) < 1 / (1 + np.exp(-logit))).astype(int)
+
+            # Reordenar al esquema esperado
+            df = df[['ClienteID', 'edad', 'sexo', 'estado_civil', 'nacionalidad', 'nivel_educativo',
+                     'ingresos_mensuales', 'ocupacion', 'nivel_riesgo_crediticio', 'tarjeta_credito', 'fuga']]
+            df.to_csv(out, header=written == 0, index=False)
+            written += n
+
+
+def run_measured(command, env, check=True):
+    """
+    Ejecutar un subproceso y devolver (segundos, RSS pico en MB, stdout)
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, cwd=SCRIPT_DIR,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if hasattr(os, 'wait4'):
+        # wait4 da el uso de recursos de este hijo en concreto
+        stdout = process.stdout.read()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    else:
+        stdout, _ = process.communicate()
+        peak_rss_mb = None
+    elapsed = time.perf_counter() - start
+
+    output = stdout.decode('utf-8', errors='replace')
+    if check and process.returncode != 0:
+        raise RuntimeError(f"Falló {' '.join(command)}:\n{output[-2000:]}")
+    return elapsed, peak_rss_mb, output
+
+
+def last_json_line(output):
+    """Último JSON de una línea impreso por un worker"""
+    for line in reversed(output.strip().splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return {}
+
+
+def isolated_env(work_dir, name):
+    """Entorno con directorios de modelos y caché propios para una medición"""
+    env = dict(os.environ)
+    env['CHURN_MODEL_DIR'] = os.path.join(work_dir, name, 'ml_models')
+    env['DATASET_CACHE_DIR'] = os.path.join(work_dir, name, 'dataset_cache')
+    env['PYTHONWARNINGS'] = 'ignore'
+    os.makedirs(env['CHURN_MODEL_DIR'], exist_ok=True)
+    return env
+
+
+def parse_importtime(output):
+    """
+    Tiempo acumulado (segundos) de cada módulo de primer nivel según -X importtime
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Los submódulos van indentados; la cabecera no tiene un número
+        if not cumulative.strip().isdigit() or name.startswith('  '):
+            continue
+        modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+
+def benchmark_startup(work_dir):
+    """
+    Arranque en frío de cada comando: tiempo total, tiempo de imports y qué
+    dependencias pesadas carga
+    """
+    python = sys.executable
+    csv_path = os.path.join(work_dir, 'churn_startup.csv')
+    output_csv = os.path.join(work_dir, 'scores_startup.csv')
+    generate_dataset(csv_path, STARTUP_ROWS)
+
+    env = isolated_env(work_dir, 'startup')
+    run_measured([python, 'xgboost_churn.py', 'train', csv_path], env)
+
+    commands = {
+        'usage': ['xgboost_churn.py'],
+        'predict': ['xgboost_churn.py', 'predict', json.dumps(SAMPLE_CUSTOMER)],
+        'predict_batch': ['xgboost_churn.py', 'predict-batch', csv_path, output_csv],
+        'train': ['xgboost_churn.py', 'train', csv_path],
+        'analysis_usage': ['analyze_dataset.py'],
+        'analysis': ['analyze_dataset.py', csv_path, os.path.join(work_dir, 'analysis_startup.json')]
+    }
+
+    results = {}
+    for name, args in commands.items():
+        print(f"[BENCH] startup {name}")
+        elapsed, rss, output = run_measured([python, '-X', 'importtime'] + args, env, check=False)
+        modules = parse_importtime(output)
+        top_imports = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:5]
+        results[name] = {
+            'seconds': elapsed,
+            'peak_rss_mb': rss,
+            'import_seconds': sum(modules.values()),
+            'heavy_modules': [module for module in HEAVY_MODULES if module in modules],
+            'top_imports': dict(top_imports)
+        }
+
+    os.remove(csv_path)
+    return results
+
+
+def benchmark_size(label, work_dir):
+    """Medir todos los puntos de entrada para un tamaño de dataset"""
+    rows = parse_size(label)
+    results = {'rows': rows}
+    python = sys.executable
+    csv_path = os.path.join(work_dir, f'churn_{label}.csv')
+
+    print(f"[BENCH] Generando dataset de {rows:,} filas...")
+    start = time.perf_counter()
+    generate_dataset(csv_path, rows)
+    results['generate'] = {'seconds': time.perf_counter() - start,
+                           'file_mb': os.path.getsize(csv_path) / (1024 * 1024)}
+
+    # Entrenamiento (llena el directorio de modelos que usan las mediciones siguientes)
+    train_env = isolated_env(work_dir, f'{label}_train')
+    print("[BENCH] train")
+    elapsed, rss, _ = run_measured([python, 'xgboost_churn.py', 'train', csv_path], train_env)
+    results['train'] = {'seconds': elapsed, 'peak_rss_mb': rss, 'rows_per_second': rows / elapsed}
+
+    # Memoria del preprocesamiento y el entrenamiento sobre el dataset ya cargado
+    print("[BENCH] train_memory")
+    elapsed, rss, output = run_measured([python, __file__, '--worker', 'train_memory', '--csv', csv_path],
+                                        isolated_env(work_dir, f'{label}_train_memory'))
+    results['train_memory'] = dict(last_json_line(output), peak_rss_mb=rss)
+
+    # Arranque en frío: un proceso 'predict' completo
+    print("[BENCH] cold_start")
+    elapsed, rss, _ = run_measured([python, 'xgboost_churn.py', 'predict', json.dumps(SAMPLE_CUSTOMER)], train_env)
+    results['cold_start'] = {'seconds': elapsed, 'peak_rss_mb': rss}
+
+    # Carga/guardado del modelo y latencia de predict_single con el modelo ya en memoria
+    print("[BENCH] predict_single / load_model / save_model")
+    elapsed, rss, output = run_measured([python, __file__, '--worker', 'predict_single'], train_env)
+    worker = last_json_line(output)
+    results['load_model'] = {'seconds': worker.get('load_seconds')}
+    results['save_model'] = {'seconds': worker.get('save_seconds')}
+    results['predict_single'] = {
+        'mean_ms': worker.get('mean_ms'),
+        'p50_ms': worker.get('p50_ms'),
+        'p99_ms': worker.get('p99_ms'),
+        'predictions_per_second': worker.get('predictions_per_second'),
+        'peak_rss_mb': rss
+    }
+
+    # Evaluador NumPy frente al booster de XGBoost sobre las mismas features
+    print("[BENCH] tree_scorer")
+    elapsed, rss, output = run_measured([python, __file__, '--worker', 'tree_scorer', '--csv', csv_path], train_env)
+    results['tree_scorer'] = dict(last_json_line(output), peak_rss_mb=rss)
+
+    # Mismas features y probabilidades en 'predict' y 'predict-batch' (falla si difieren)
+    print("[BENCH] predict_parity")
+    elapsed, rss, output = run_measured([python, __file__, '--worker', 'predict_parity', '--csv', csv_path], train_env)
+    results['predict_parity'] = dict(last_json_line(output), peak_rss_mb=rss)
+
+    # Evaluación NumPy frente a sklearn.metrics usando el dataset completo como test
+    print("[BENCH] evaluation")
+    elapsed, rss, output = run_measured([python, __file__, '--worker', 'evaluation', '--csv', csv_path], train_env)
+    results['evaluation'] = dict(last_json_line(output), peak_rss_mb=rss)
+
+    # Puntuación por lotes del dataset completo
+    print("[BENCH] predict_batch")
+    output_csv = os.path.join(work_dir, f'scores_{label}.csv')
+    elapsed, rss, _ = run_measured([python, 'xgboost_churn.py', 'predict-batch', csv_path, output_csv], train_env)
+    results['predict_batch'] = {'seconds': elapsed, 'peak_rss_mb': rss, 'rows_per_second': rows / elapsed}
+    os.remove(output_csv)
+
+    # Análisis con directorios propios: incluye el entrenamiento de sus métricas ML
+    print("[BENCH] analysis")
+    analysis_env = isolated_env(work_dir, f'{label}_analysis')
+    analysis_json = os.path.join(work_dir, f'analysis_{label}.json')
+    elapsed, rss, _ = run_measured([python, 'analyze_dataset.py', csv_path, analysis_json], analysis_env)
+    results['analysis'] = {'seconds': elapsed, 'peak_rss_mb': rss, 'rows_per_second': rows / elapsed}
+
+    os.remove(csv_path)
+    return results
+
+
+def worker_predict_single():
+    """Worker: medir load_model, save_model y la latencia de predict_single"""
+    sys.path.insert(0, SCRIPT_DIR)
+    from xgboost_churn import CustomerChurnPredictor
+
+    predictor = CustomerChurnPredictor()
+    start = time.perf_counter()
+    predictor.load_model()
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predictor.save_model(tempfile.mkdtemp())
+    save_seconds = time.perf_counter() - start
+
+    # Calentamiento
+    for _ in range(10):
+        predictor.predict_single(SAMPLE_CUSTOMER)
+
+    latencies = []
+    for _ in range(SINGLE_PREDICTIONS):
+        start = time.perf_counter()
+        predictor.predict_single(SAMPLE_CUSTOMER)
+        latencies.append(time.perf_counter() - start)
+
+    latencies_ms = np.array(latencies) * 1000
+    print(json.dumps({
+        'load_seconds': load_seconds,
+        'save_seconds': save_seconds,
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'predictions_per_second': float(1000 / latencies_ms.mean())
+    }))
+
+
+def worker_train_memory(csv_path):
+    """
+    Worker: RSS tras cargar el dataset y pico de fit_dataframe (preprocesamiento +
+    entrenamiento), para ver cuánta memoria añade el pipeline sobre los datos de entrada
+    """
+    sys.path.insert(0, SCRIPT_DIR)
+    from xgboost_churn import CustomerChurnPredictor
+    from churn_pipeline import FEATURE_COLUMNS
+    from profiling import Profiler, peak_rss_mb
+
+    predictor = CustomerChurnPredictor(profiler=Profiler('time'))
+    df = predictor.load_and_preprocess_data(csv_path)
+    load_rss_mb = peak_rss_mb()
+
+    start = time.perf_counter()
+    predictor.fit_dataframe(df, FEATURE_COLUMNS)
+    fit_seconds = time.perf_counter() - start
+    phases = predictor.profiler.records
+
+    print(json.dumps({
+        'rows': len(df),
+        'load_peak_rss_mb': load_rss_mb,
+        'encode_peak_rss_mb': phases['encode']['peak_rss_mb'],
+        'fit_peak_rss_mb': phases['fit']['peak_rss_mb'],
+        'pipeline_extra_mb': peak_rss_mb() - load_rss_mb,
+        'fit_dataframe_seconds': fit_seconds
+    }))
+
+
+def worker_tree_scorer(csv_path):
+    """
+    Worker: comparar el evaluador NumPy con XGBoost. La exactitud se mide desde las filas
+    crudas (transform del evaluador frente a prepare_features y el booster) y el worker
+    termina con error si los márgenes difieren o las probabilidades superan PARITY_MAX_ULP;
+    el throughput se mide sobre el dataset completo ya preparado.
+    """
+    sys.path.insert(0, SCRIPT_DIR)
+    from xgboost_churn import CustomerChurnPredictor
+    from dataset_io import read_dataset
+    from tree_scorer import TreeEnsembleScorer
+    from model_bundle import BUNDLE_FILE
+
+    predictor = CustomerChurnPredictor()
+    predictor.load_model()
+    start = time.perf_counter()
+    scorer = TreeEnsembleScorer.from_bundle(os.path.join(predictor.model_dir, BUNDLE_FILE))
+    load_seconds = time.perf_counter() - start
+    booster = predictor.model.get_booster()
+
+    # Camino de 'predict': de los diccionarios del cliente a la probabilidad
+    text, records = sample_rows(csv_path)
+    reference_X = predictor.prepare_features(sample_chunk(text, predictor, len(records))).to_numpy(np.float32)
+    start = time.perf_counter()
+    X = scorer.transform(records)
+    transform_seconds = time.perf_counter() - start
+    reference_margin = booster.inplace_predict(reference_X, predict_type='margin')
+    margin_mismatches = int((scorer.predict_margin(X) != reference_margin).sum())
+    ulps = float32_ulps(scorer.predict_proba(X), booster.inplace_predict(reference_X))
+
+    X = predictor.prepare_features(read_dataset(csv_path)).to_numpy(np.float32)
+    start = time.perf_counter()
+    booster.inplace_predict(X)
+    xgb_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    scorer.predict_proba(X)
+    numpy_seconds = time.perf_counter() - start
+
+    report = {
+        'load_seconds': load_seconds,
+        'rows_per_second': len(X) / numpy_seconds,
+        'xgboost_rows_per_second': len(X) / xgb_seconds,
+        'transform_rows_per_second': len(records) / transform_seconds,
+        'compared_rows': len(records),
+        'margin_mismatches': margin_mismatches,
+        'proba_mismatches': int((ulps > 0).sum()),
+        'proba_max_ulp': int(ulps.max()) if len(ulps) else 0
+    }
+    print(json.dumps(report))
+    if margin_mismatches or report['proba_max_ulp'] > PARITY_MAX_ULP:
+        sys.exit("[ERROR] El evaluador NumPy no coincide con XGBoost")
+
+
+def sample_rows(csv_path):
+    """Texto de las primeras PARITY_ROWS filas del CSV (con cabecera) y sus diccionarios"""
+    import csv
+    import io
+    import itertools
+
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        text = ''.join(itertools.islice(f, PARITY_ROWS + 1))
+    return text, list(csv.DictReader(io.StringIO(text)))
+
+
+def sample_chunk(text, predictor, rows):
+    """Las mismas filas leídas como en 'predict-batch' (bloque tipado de dataset_io)"""
+    import io
+    from dataset_io import iter_dataset_chunks
+
+    return next(iter_dataset_chunks(io.StringIO(text), columns=predictor.feature_columns, chunksize=rows))
+
+
+def float32_ulps(a, b):
+    """Distancia en ulps entre dos arrays float32 (0 = idénticos bit a bit)"""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    return np.abs(a.view(np.int32).astype(np.int64) - b.view(np.int32))
+
+
+def worker_predict_parity(csv_path):
+    """
+    Worker: las primeras PARITY_ROWS filas del CSV, como diccionarios, por los caminos
+    individuales (evaluador NumPy de 'predict' e InferenceEngine de predict_single y
+    'serve') y por el de 'predict-batch' (score_csv). Las features deben ser idénticas y
+    las probabilidades coincidir salvo PARITY_MAX_ULP; si no, el worker termina con error.
+    """
+    import io
+    import pandas as pd
+
+    sys.path.insert(0, SCRIPT_DIR)
+    from xgboost_churn import CustomerChurnPredictor, prediction_result
+    from evaluation import DEFAULT_THRESHOLDS
+    from tree_scorer import TreeEnsembleScorer
+    from model_bundle import BUNDLE_FILE
+
+    text, records = sample_rows(csv_path)
+    predictor = CustomerChurnPredictor()
+    predictor.load_model()
+    scored = io.StringIO()
+    predictor.score_csv(io.StringIO(text), scored, chunksize=len(records), progress=False)
+    scored.seek(0)
+    batch = pd.read_csv(scored, dtype={'probabilidad_desercion': np.float32})
+    batch_X = predictor.prepare_features(sample_chunk(text, predictor, len(records))).to_numpy(np.float32)
+
+    # Lo que hace predict_single_numpy, para todas las filas a la vez
+    scorer = TreeEnsembleScorer.from_bundle(os.path.join(predictor.model_dir, BUNDLE_FILE))
+    thresholds = scorer.thresholds or DEFAULT_THRESHOLDS
+    X = scorer.transform(records)
+    single = [prediction_result(float(p), thresholds) for p in scorer.predict_proba(X)]
+
+    # Camino de predict_single/'serve': una fila float32 por cliente con fill_row
+    engine = predictor.get_inference_engine()
+    engine_X = np.empty_like(batch_X)
+    for record, row in zip(records, engine_X):
+        engine.fill_row(record, row)
+    paths = {'numpy': (X, single), 'engine': (engine_X, predictor.predict_many(records))}
+
+    report = {'rows': len(records)}
+    failed = False
+    for name, (features, results) in paths.items():
+        ulps = float32_ulps([r['probabilidad_desercion'] for r in results], batch['probabilidad_desercion'])
+        path_report = {
+            'feature_mismatches': int((float32_ulps(features, batch_X) > 0).sum()),
+            'proba_max_ulp': int(ulps.max()) if len(ulps) else 0,
+            'decision_mismatches': int(sum(r['desercion_predicha'] != d
+                                           for r, d in zip(results, batch['desercion_predicha']))),
+            'risk_mismatches': int(sum(r['riesgo'] != band for r, band in zip(results, batch['riesgo'])))
+        }
+        report[name] = path_report
+        failed |= bool(path_report['feature_mismatches'] or path_report['proba_max_ulp'] > PARITY_MAX_ULP
+                       or path_report['decision_mismatches'] or path_report['risk_mismatches'])
+    print(json.dumps(report))
+    if failed:
+        sys.exit("[ERROR] La predicción individual y 'predict-batch' no coinciden")
+
+
+def sklearn_metrics(y_test, y_pred, y_proba):
+    """Las llamadas de sklearn.metrics que hacía la evaluación antes de evaluation.py"""
+    from sklearn.metrics import (
+        accuracy_score, precision_score, recall_score, f1_score,
+        roc_auc_score, confusion_matrix, classification_report
+    )
+
+    cm = confusion_matrix(y_test, y_pred, labels=[0, 1])
+    report = classification_report(y_test, y_pred, labels=[0, 1], output_dict=True, zero_division=0)
+    return {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'precision': precision_score(y_test, y_pred, zero_division=0),
+        'recall': recall_score(y_test, y_pred, zero_division=0),
+        'f1_score': f1_score(y_test, y_pred, zero_division=0),
+        'roc_auc': roc_auc_score(y_test, y_proba),
+        'confusion_matrix': cm.ravel().tolist(),
+        'classification_report': {label: [report[label][key] for key in ('precision', 'recall', 'f1-score')]
+                                  for label in ['0', '1']}
+    }
+
+
+def worker_evaluation(csv_path):
+    """Worker: tiempo de evaluate_predictions frente a sklearn.metrics sobre las mismas predicciones"""
+    sys.path.insert(0, SCRIPT_DIR)
+    from xgboost_churn import CustomerChurnPredictor
+    from dataset_io import read_dataset
+    from churn_pipeline import target_values
+    from evaluation import DECISION_THRESHOLD, evaluate_predictions, threshold_analysis
+
+    predictor = CustomerChurnPredictor()
+    predictor.load_model()
+    df = read_dataset(csv_path)
+    y = np.asarray(target_values(df, 'fuga'), dtype=np.int8)
+    y_proba = predictor.model.get_booster().inplace_predict(predictor.prepare_features(df).to_numpy(np.float32))
+    y_pred = y_proba > DECISION_THRESHOLD
+    del df
+
+    start = time.perf_counter()
+    metrics = evaluate_predictions(y, y_pred, y_proba)
+    numpy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analysis = threshold_analysis(y, y_proba)
+    sweep_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = sklearn_metrics(y, y_pred, y_proba)
+    sklearn_seconds = time.perf_counter() - start
+
+    cm = metrics['confusion_matrix']
+    same = (all(metrics[key] == reference[key] for key in ('accuracy', 'precision', 'recall', 'f1_score', 'roc_auc'))
+            and [cm['true_negative'], cm['false_positive'], cm['false_negative'], cm['true_positive']] == reference['confusion_matrix']
+            and all([metrics['classification_report'][label][key] for key in ('precision', 'recall', 'f1-score')]
+                    == reference['classification_report'][label] for label in ['0', '1']))
+    print(json.dumps({
+        'rows': len(y),
+        'seconds': numpy_seconds,
+        'sklearn_seconds': sklearn_seconds,
+        'threshold_sweep_seconds': sweep_seconds,
+        'evaluated_thresholds': analysis.get('evaluated_thresholds', 0),
+        'rows_per_second': len(y) / numpy_seconds,
+        'identical_to_sklearn': bool(same)
+    }))
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=SCRIPT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(report, output_path):
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+def main():
+    args = sys.argv[1:]
+    options = {args[i][2:]: args[i + 1] for i in range(0, len(args) - 1, 2) if args[i].startswith('--')}
+
+    if 'worker' in options:
+        if options['worker'] == 'predict_single':
+            worker_predict_single()
+        elif options['worker'] == 'train_memory':
+            worker_train_memory(options['csv'])
+        elif options['worker'] == 'tree_scorer':
+            worker_tree_scorer(options['csv'])
+        elif options['worker'] == 'predict_parity':
+            worker_predict_parity(options['csv'])
+        elif options['worker'] == 'evaluation':
+            worker_evaluation(options['csv'])
+        return
+
+    sizes = [label for label in options.get('sizes', ','.join(DEFAULT_SIZES)).split(',') if label]
+    output_path = options.get('output', 'benchmark_results.json')
+    work_dir = options.get('work-dir') or tempfile.mkdtemp(prefix='churn_bench_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    report = {
+        'commit': current_commit(),
+        'fecha': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'startup': {},
+        'results': {}
+    }
+
+    print("\n[BENCH] ===== startup =====")
+    report['startup'] = benchmark_startup(work_dir)
+    write_report(report, output_path)
+
+    for label in sizes:
+        print(f"\n[BENCH] ===== {label} =====")
+        report['results'][label] = benchmark_size(label, work_dir)
+        # Guardar resultados parciales por si una escala grande no termina
+        write_report(report, output_path)
+
+    print(f"\n[BENCH] Resultados guardados en: {output_path}")
+    print(json.dumps({'startup': report['startup'], 'results': report['results']}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Pipeline de entrenamiento compartido por xgboost_churn.py y analyze_dataset.py:
+features, configuración del modelo, partición y artefactos por dataset
+(la evaluación está en evaluation.py).
+
+sklearn y xgboost se importan dentro de las funciones que los usan: las constantes
+de este módulo se leen también desde comandos que no entrenan.
+"""
+
+import json
+import os
+
+import numpy as np
+
+# Features del modelo, en el orden en que se entrenan
+FEATURE_COLUMNS = ['edad', 'sexo', 'estado_civil', 'nacionalidad',
+                   'nivel_educativo', 'ingresos_mensuales', 'ocupacion',
+                   'nivel_riesgo_crediticio', 'tarjeta_credito']
+
+NUMERICAL_FEATURES = ['edad', 'ingresos_mensuales']
+
+# Columnas que exige el entrenamiento desde CSV (la fuga viene en 'fuga')
+REQUIRED_COLUMNS = ['ClienteID'] + FEATURE_COLUMNS + ['fuga']
+
+# Columnas de fuga reconocidas, por prioridad ('cliente_activo' se invierte)
+TARGET_COLUMNS = ['fuga', 'desercion', 'churn', 'cliente_activo']
+
+# Configuración única del modelo para entrenamiento y análisis.
+# El número de hilos no forma parte de ella: no cambia el modelo resultante.
+MODEL_PARAMS = {
+    'n_estimators': 20,    # Muy reducido para velocidad
+    'max_depth': 3,        # Muy reducido para velocidad
+    'learning_rate': 0.3,  # Aumentado para compensar menos estimadores
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'tree_method': 'hist', # Histogramas: escala con el número de núcleos
+    'max_bin': int(os.environ.get('CHURN_MAX_BIN', '256')),
+    'random_state': 42,
+    'verbosity': 0         # Sin output verboso
+}
+
+# Hilos de entrenamiento: 'auto' (todos los núcleos disponibles) o un número
+DEFAULT_N_JOBS = os.environ.get('CHURN_N_JOBS', 'auto')
+
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+# Fracción de las filas de entrenamiento reservada para calibrar los umbrales de decisión
+CALIBRATION_SIZE = float(os.environ.get('CHURN_CALIBRATION_SIZE', '0.1'))
+
+# Árboles que añade cada actualización incremental ('update')
+UPDATE_ROUNDS = int(os.environ.get('CHURN_UPDATE_ROUNDS', '10'))
+
+# Subdirectorio de ml_models/ con los artefactos de cada dataset (por hash)
+DATASET_ARTIFACTS_DIR = 'datasets'
+
+# Mejor configuración encontrada por 'tune' (en ml_models/); 'train' la aplica si existe
+TUNED_PARAMS_FILE = 'tuned_params.json'
+
+
+def detect_target_column(df):
+    """Primera columna de fuga disponible en el DataFrame, o None"""
+    for col in TARGET_COLUMNS:
+        if col in df.columns:
+            return col
+    return None
+
+
+def target_values(df, target_col):
+    """Serie 0/1 de fuga (1 = el cliente se fue)"""
+    if target_col == 'cliente_activo':
+        return (df[target_col] == 0).astype('int8')
+    return df[target_col].astype('int8')
+
+
+def resolve_n_jobs(n_jobs=None):
+    """Número de hilos a usar; 'auto', None o 0 detectan los núcleos disponibles"""
+    if n_jobs is None:
+        n_jobs = DEFAULT_N_JOBS
+    if str(n_jobs).lower() in ('auto', '0', '-1'):
+        try:
+            return len(os.sched_getaffinity(0))
+        except AttributeError:
+            return os.cpu_count() or 1
+    return max(1, int(n_jobs))
+
+
+def model_params(max_bin=None, tuned=None):
+    """
+    Configuración del modelo: la compartida, con los parámetros ajustados por 'tune'
+    (si se indican) y el max_bin explícito (si se indica) por encima
+    """
+    params = dict(MODEL_PARAMS)
+    if tuned:
+        params.update(tuned)
+    if max_bin is not None:
+        params['max_bin'] = int(max_bin)
+    return params
+
+
+def build_model(n_jobs=None, max_bin=None, tuned=None):
+    """Clasificador XGBoost con la configuración compartida"""
+    import xgboost as xgb
+
+    return xgb.XGBClassifier(n_jobs=resolve_n_jobs(n_jobs), **model_params(max_bin, tuned))
+
+
+def load_tuned_params(model_dir):
+    """Parámetros guardados por 'tune' en el directorio de modelos, o None"""
+    path = os.path.join(model_dir, TUNED_PARAMS_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['params']
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[WARNING] Configuración ajustada inválida, se ignorará: {str(e)}")
+        return None
+
+
+def float32_order_keys(values):
+    """Claves enteras con el mismo orden que los float32 (sin NaN)"""
+    bits = np.asarray(values, dtype=np.float32).view(np.int32).astype(np.int64)
+    return np.where(bits < 0, -(bits & 0x7FFFFFFF), bits)
+
+
+def float32_from_order_keys(keys):
+    """Inversa de float32_order_keys"""
+    keys = np.asarray(keys, dtype=np.int64)
+    bits = np.where(keys < 0, (-keys) | -0x80000000, keys).astype(np.int32)
+    return bits.view(np.float32)
+
+
+def standard_scale(values, mean, scale):
+    """(x - media) / escala en float32, con las mismas operaciones que StandardScaler.transform"""
+    return (np.asarray(values, dtype=np.float32) - np.float32(mean)) / np.float32(scale)
+
+
+def rescale_numeric_splits(model, scalings):
+    """
+    Reexpresar los umbrales de los árboles cuando cambia el escalado de una feature.
+    scalings = {índice de feature: ((media, escala) anteriores, (media, escala) nuevas)}.
+
+    Para cada umbral se busca (bisección sobre todos los float32) el menor valor original
+    que con el escalado anterior iba a la derecha, y el nuevo umbral es ese valor con el
+    escalado nuevo: todo valor original float32 sigue la misma rama. La excepción son los
+    valores contiguos a ese punto que el escalado nuevo redondea al mismo float32 (escala
+    nueva mayor que la anterior); esos pueden cambiar de rama, por eso 'update' mide el
+    cambio de margen sobre sus datos.
+    Devuelve el booster ajustado (el del modelo, modificado en su lugar).
+    """
+    booster = model.get_booster()
+    raw = json.loads(booster.save_raw('json'))
+    trees = raw['learner']['gradient_booster']['model']['trees']
+
+    # Nodos (árbol, nodo) de cada feature reescalada y sus umbrales
+    nodes = {feature: [] for feature in scalings}
+    for t, tree in enumerate(trees):
+        for node, (feature, left) in enumerate(zip(tree['split_indices'], tree['left_children'])):
+            # En las hojas split_conditions guarda el valor de la hoja: no se toca
+            if left != -1 and feature in nodes:
+                nodes[feature].append((t, node))
+
+    for feature, locations in nodes.items():
+        if not locations:
+            continue
+        (old_mean, old_scale), (new_mean, new_scale) = scalings[feature]
+        thresholds = np.array([trees[t]['split_conditions'][node] for t, node in locations], dtype=np.float32)
+
+        # Menor valor original x con escalado_anterior(x) >= umbral (la regla es 'x < umbral')
+        low = np.full(len(thresholds), float32_order_keys(np.float32(-np.inf)), dtype=np.int64)
+        high = np.full(len(thresholds), float32_order_keys(np.float32(np.inf)), dtype=np.int64)
+        while (low < high).any():
+            middle = (low + high) // 2
+            goes_right = standard_scale(float32_from_order_keys(middle), old_mean, old_scale) >= thresholds
+            high = np.where(goes_right, middle, high)
+            low = np.where(goes_right, low, middle + 1)
+
+        new_thresholds = standard_scale(float32_from_order_keys(low), new_mean, new_scale)
+        for (t, node), threshold in zip(locations, new_thresholds):
+            trees[t]['split_conditions'][node] = float(threshold)
+
+    booster.load_model(bytearray(json.dumps(raw).encode('utf-8')))
+    return booster
+
+
+def split_train_test(X, y):
+    """Partición estratificada (si ambas clases tienen al menos dos muestras)"""
+    from sklearn.model_selection import train_test_split
+
+    class_counts = np.bincount(np.asarray(y, dtype=np.int64), minlength=2)
+    stratify = y if (class_counts >= 2).all() else None
+    return train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=stratify)
+
+
+def split_train_test_indices(y, test_size=TEST_SIZE):
+    """
+    Índices (entrenamiento, evaluación) de la misma partición que split_train_test,
+    calculados solo con arrays de índices: sklearn acumula los índices de cada clase
+    en listas de Python, que con millones de filas pesan varias veces los datos.
+    Sigue el mismo algoritmo y la misma secuencia aleatoria que sklearn.
+    """
+    y = np.asarray(y)
+    n_rows = len(y)
+    n_test = int(np.ceil(test_size * n_rows))
+    n_train = n_rows - n_test
+    rng = np.random.RandomState(RANDOM_STATE)
+
+    class_counts = np.array([np.count_nonzero(y == 0), np.count_nonzero(y == 1)])
+    if not (class_counts >= 2).all():
+        permutation = rng.permutation(n_rows)
+        return permutation[n_test:], permutation[:n_test]
+
+    # Filas por clase en cada partición (moda aproximada de la hipergeométrica)
+    train_counts = _approximate_mode(class_counts, n_train, rng)
+    test_counts = _approximate_mode(class_counts - train_counts, n_test, rng)
+
+    train_parts, test_parts = [], []
+    for label, (n_class_train, n_class_test) in enumerate(zip(train_counts, test_counts)):
+        members = np.flatnonzero(y == label)
+        members = members[rng.permutation(len(members))]
+        train_parts.append(members[:n_class_train])
+        test_parts.append(members[n_class_train:n_class_train + n_class_test])
+    return rng.permutation(np.concatenate(train_parts)), rng.permutation(np.concatenate(test_parts))
+
+
+def training_row_order(y):
+    """
+    Orden de filas para la matriz de entrenamiento: (filas, n_fit, n_train). Las filas
+    [0, n_fit) entrenan el modelo, [n_fit, n_train) son la validación que calibra los
+    umbrales (CALIBRATION_SIZE de las de entrenamiento, estratificada) y el resto son la
+    partición de evaluación de split_train_test_indices.
+    """
+    train_rows, test_rows = split_train_test_indices(y)
+    fit, valid = split_train_test_indices(np.asarray(y)[train_rows], CALIBRATION_SIZE)
+    rows = np.concatenate([train_rows[fit], train_rows[valid], test_rows])
+    return rows, len(fit), len(train_rows)
+
+
+def _approximate_mode(class_counts, n_draws, rng):
+    """Reparto de n_draws entre clases proporcional a class_counts (desempates al azar)"""
+    continuous = class_counts / class_counts.sum() * n_draws
+    floored = np.floor(continuous)
+    need_to_add = int(n_draws - floored.sum())
+    if need_to_add > 0:
+        remainder = continuous - floored
+        for value in np.sort(np.unique(remainder))[::-1]:
+            (candidates,) = np.where(remainder == value)
+            add_now = min(len(candidates), need_to_add)
+            floored[rng.choice(candidates, size=add_now, replace=False)] += 1
+            need_to_add -= add_now
+            if need_to_add == 0:
+                break
+    return floored.astype(int)
+
+
+def dataset_artifacts_dir(model_dir, dataset_hash):
+    """Directorio de artefactos (modelo + métricas) entrenados con un dataset concreto"""
+    return os.path.join(model_dir, DATASET_ARTIFACTS_DIR, dataset_hash)
+
+
+def load_dataset_metrics(model_dir, dataset_hash, model_files, params=None):
+    """
+    Métricas de un modelo ya entrenado con este dataset y la configuración actual,
+    o None si no hay artefactos completos
+    """
+    if not dataset_hash:
+        return None
+
+    artifacts_dir = dataset_artifacts_dir(model_dir, dataset_hash)
+    metrics_path = os.path.join(artifacts_dir, 'metrics_report.json')
+    required = [os.path.join(artifacts_dir, name) for name in model_files] + [metrics_path]
+    if not all(os.path.exists(path) for path in required):
+        return None
+
+    with open(metrics_path, 'r', encoding='utf-8') as f:
+        metrics = json.load(f)
+
+    # Un cambio en la configuración del modelo invalida los artefactos guardados
+    if metrics.get('model_params') != (params or MODEL_PARAMS):
+        return None
+    return metrics
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Validación cruzada estratificada en K folds con los folds entrenados en paralelo en
+un pool de procesos.
+
+La matriz de features se escribe una sola vez en memoria compartida, ordenada por fold:
+el fold de evaluación es un bloque contiguo y el de entrenamiento son los dos bloques
+que lo rodean, así que cada proceso entrega a XGBoost vistas de la matriz compartida
+(por un DataIter) sin copiar filas.
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from churn_pipeline import RANDOM_STATE
+from evaluation import DECISION_THRESHOLD, evaluate_predictions
+from external_memory import chunk_iterator
+
+# Métricas resumidas con media y desviación típica entre folds
+CV_METRICS = ['accuracy', 'precision', 'recall', 'f1_score', 'roc_auc']
+
+# Arrays compartidos abiertos por cada proceso del pool
+_fold_data = {}
+
+
+class SharedArray:
+    """
+    Array NumPy sobre un bloque de memoria compartida; `spec` permite abrirlo desde
+    otro proceso. Al salir del contexto se libera y se elimina el bloque.
+    """
+
+    def __init__(self, shape, dtype):
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        self.memory = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.memory.buf)
+        self.spec = (self.memory.name, tuple(shape), dtype.str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # La vista debe soltarse antes de cerrar el bloque
+        self.array = None
+        self.memory.close()
+        self.memory.unlink()
+        return False
+
+
+def attach_shared(spec):
+    """Abrir desde otro proceso un array creado con SharedArray: (bloque, array)"""
+    name, shape, dtype = spec
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf)
+
+
+def assign_folds(y, folds):
+    """
+    Orden de filas agrupado por fold estratificado y límites de cada fold en ese orden:
+    las filas order[bounds[k]:bounds[k + 1]] forman el fold k
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE)
+    fold_of_row = np.empty(len(y), dtype=np.int16)
+    for fold, (_, test_rows) in enumerate(splitter.split(np.empty((len(y), 0)), y)):
+        fold_of_row[test_rows] = fold
+
+    order = np.argsort(fold_of_row, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(fold_of_row, minlength=folds))])
+    return order, bounds.tolist()
+
+
+def init_fold_worker(x_spec, y_spec):
+    """Inicializador del pool: abrir una vez por proceso la matriz y las etiquetas"""
+    for key, spec in (('X', x_spec), ('y', y_spec)):
+        memory, array = attach_shared(spec)
+        _fold_data[key] = array
+        _fold_data[f'{key}_memory'] = memory
+
+
+def fit_fold(task):
+    """
+    Tarea del pool: entrenar sin las filas [start, end) y evaluar sobre ellas
+    """
+    import xgboost as xgb
+
+    start, end, params, rounds = task
+    X, y = _fold_data['X'], _fold_data['y']
+
+    def train_blocks():
+        for rows in (slice(0, start), slice(end, len(y))):
+            if rows.stop > rows.start:
+                yield X[rows], y[rows]
+
+    data = xgb.QuantileDMatrix(chunk_iterator(train_blocks, None), max_bin=params['max_bin'],
+                               nthread=params['n_jobs'])
+    booster = xgb.train(params, data, num_boost_round=rounds)
+    del data
+
+    probabilities = booster.inplace_predict(X[start:end])
+    predicted = (probabilities > DECISION_THRESHOLD).astype(np.int8)
+    metrics = evaluate_predictions(y[start:end], predicted, probabilities)
+    metrics['train_size'] = int(len(y) - (end - start))
+    metrics['test_size'] = int(end - start)
+    return metrics
+
+
+def run_folds(x_spec, y_spec, bounds, params, rounds, processes):
+    """Métricas de cada fold, entrenando `processes` folds a la vez"""
+    tasks = [(start, end, params, rounds) for start, end in zip(bounds[:-1], bounds[1:])]
+    if processes <= 1:
+        init_fold_worker(x_spec, y_spec)
+        try:
+            return [fit_fold(task) for task in tasks]
+        finally:
+            release_fold_worker()
+
+    # 'spawn': los procesos no heredan el estado de OpenMP del padre
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes, initializer=init_fold_worker, initargs=(x_spec, y_spec)) as pool:
+        return pool.map(fit_fold, tasks)
+
+
+def release_fold_worker():
+    """Cerrar los arrays compartidos abiertos en este proceso"""
+    for key in ('X', 'y'):
+        _fold_data.pop(key, None)
+        memory = _fold_data.pop(f'{key}_memory', None)
+        if memory is not None:
+            memory.close()
+
+
+def summarize_folds(fold_metrics):
+    """Sección 'cross_validation': media y desviación típica por métrica y detalle por fold"""
+    values = {metric: np.array([fold[metric] for fold in fold_metrics]) for metric in CV_METRICS}
+    return {
+        'folds': len(fold_metrics),
+        'mean': {metric: float(values[metric].mean()) for metric in CV_METRICS},
+        'std': {metric: float(values[metric].std()) for metric in CV_METRICS},
+        'per_fold': [
+            dict({metric: float(fold[metric]) for metric in CV_METRICS},
+                 confusion_matrix=fold['confusion_matrix'],
+                 train_size=fold['train_size'], test_size=fold['test_size'])
+            for fold in fold_metrics
+        ]
+    }
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Caché columnar (Feather/Arrow) de los datasets subidos, indexada por el hash del CSV
+"""
+
+import hashlib
+import os
+
+# Cambiar al modificar los tipos de la capa de ingesta para invalidar copias antiguas
+CACHE_FORMAT_VERSION = 1
+
+# Tamaño máximo de la caché antes de expulsar las entradas menos usadas
+DEFAULT_MAX_SIZE_MB = int(os.environ.get('DATASET_CACHE_MAX_MB', '2048'))
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# (pyarrow, pyarrow.feather) tras el primer uso; False si no está instalado
+_arrow = None
+
+
+def arrow_modules():
+    """
+    Importar pyarrow solo cuando se usa la caché (calcular el hash no lo necesita)
+    """
+    global _arrow
+    if _arrow is None:
+        try:
+            import pyarrow as pa
+            import pyarrow.feather as feather
+            _arrow = (pa, feather)
+        except ImportError:
+            _arrow = False
+    return _arrow or None
+
+
+def columns_key(columns):
+    """Clave corta y estable de un conjunto de columnas (sin importar el orden)"""
+    digest = hashlib.blake2b('\0'.join(sorted(set(columns))).encode('utf-8'), digest_size=6)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    def __init__(self, cache_dir=None, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        if cache_dir is None:
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            cache_dir = os.environ.get('DATASET_CACHE_DIR', os.path.join(script_dir, 'dataset_cache'))
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+
+    @property
+    def available(self):
+        """La caché requiere pyarrow; sin él se lee siempre el CSV"""
+        return arrow_modules() is not None
+
+    def file_hash(self, csv_path):
+        """
+        Hash del contenido del CSV (no de su nombre ni de su fecha)
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        with open(csv_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def entry_path(self, dataset_hash, columns=None):
+        """
+        Copia con todas las columnas o, si se indican columnas, la copia podada con
+        solo esas (el conjunto de columnas forma parte del nombre)
+        """
+        if columns is None:
+            return os.path.join(self.cache_dir, f'{dataset_hash}.v{CACHE_FORMAT_VERSION}.feather')
+        return os.path.join(self.cache_dir,
+                            f'{dataset_hash}.{columns_key(columns)}.v{CACHE_FORMAT_VERSION}.feather')
+
+    def find_entry(self, dataset_hash, columns=None):
+        """
+        Copia que puede servir las columnas pedidas: la completa si existe, si no la
+        podada con exactamente esas columnas; None si no hay ninguna
+        """
+        candidates = [self.entry_path(dataset_hash)]
+        if columns is not None:
+            candidates.append(self.entry_path(dataset_hash, columns))
+        for path in candidates:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def load(self, dataset_hash, columns=None):
+        """
+        Leer la copia columnar (memory-mapped) si existe; None si no está en caché
+        """
+        if not self.available:
+            return None
+
+        path = self.find_entry(dataset_hash, columns)
+        if path is None:
+            return None
+
+        _, feather = arrow_modules()
+        try:
+            table = feather.read_table(path, columns=self._present_columns(path, columns), memory_map=True)
+            df = table.to_pandas()
+        except Exception as e:
+            print(f"[WARNING] Entrada de caché inválida, se ignorará: {str(e)}")
+            return None
+
+        # Marcar como usada recientemente para la política LRU
+        os.utime(path)
+        print(f"[INFO] Dataset leído desde caché: {path}")
+        return df
+
+    def _present_columns(self, path, columns):
+        """Columnas pedidas que existen en la copia (None = todas)"""
+        if columns is None:
+            return None
+        pa, _ = arrow_modules()
+        with pa.memory_map(path) as source:
+            schema_names = pa.ipc.open_file(source).schema.names
+        wanted = set(columns)
+        return [col for col in schema_names if col in wanted]
+
+    def iter_chunks(self, dataset_hash, columns=None, chunksize=None):
+        """
+        Iterar la copia columnar por bloques de filas sin cargarla entera: la tabla
+        queda mapeada en memoria y solo cada bloque se convierte a pandas.
+        None si el dataset no está en caché.
+        """
+        if not self.available:
+            return None
+
+        path = self.find_entry(dataset_hash, columns)
+        if path is None:
+            return None
+
+        _, feather = arrow_modules()
+        try:
+            table = feather.read_table(path, columns=self._present_columns(path, columns), memory_map=True)
+        except Exception as e:
+            print(f"[WARNING] Entrada de caché inválida, se ignorará: {str(e)}")
+            return None
+
+        os.utime(path)
+        print(f"[INFO] Dataset leído por bloques desde caché: {path}")
+        step = chunksize or max(1, table.num_rows)
+        return (table.slice(start, step).to_pandas() for start in range(0, table.num_rows, step))
+
+    def store(self, dataset_hash, df, columns=None):
+        """
+        Guardar la copia columnar de forma atómica y aplicar el límite de tamaño.
+        Con columnas, df es la lectura podada a esas columnas y se guarda aparte.
+        """
+        if not self.available:
+            return None
+
+        _, feather = arrow_modules()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.entry_path(dataset_hash, columns)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            # Sin compresión para que la lectura pueda mapear el archivo directamente
+            feather.write_feather(df, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, path)
+            print(f"[INFO] Dataset guardado en caché: {path}")
+            self.evict(keep=path)
+            return path
+        except Exception as e:
+            print(f"[WARNING] No se pudo guardar el dataset en caché: {str(e)}")
+            return None
+
+    def evict(self, keep=None):
+        """
+        Expulsar las entradas usadas hace más tiempo hasta respetar el tamaño máximo
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.feather'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total_size -= size
+            print(f"[INFO] Entrada de caché expulsada: {path}")
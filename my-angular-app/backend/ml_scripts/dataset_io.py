@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Capa de ingesta compartida para los datasets de clientes: lectura por bloques,
+solo de las columnas requeridas y con tipos compactos
+"""
+
+import os
+
+import numpy as np
+
+from dataset_cache import DatasetCache
+
+# Columnas categóricas del esquema de clientes
+CATEGORICAL_COLUMNS = ['sexo', 'estado_civil', 'nacionalidad', 'nivel_educativo',
+                       'ocupacion', 'nivel_riesgo_crediticio', 'tarjeta_credito']
+
+# Columnas enteras y el tipo compacto al que se reducen cuando no tienen nulos
+INTEGER_COLUMNS = {
+    'edad': 'int16',
+    'fuga': 'int8'
+}
+
+# Tipos aplicados directamente por el parser de CSV
+CSV_DTYPES = dict({col: 'category' for col in CATEGORICAL_COLUMNS},
+                  ingresos_mensuales='float32')
+
+# Filas por bloque al leer el CSV
+DEFAULT_CHUNK_SIZE = 250000
+
+# Hashes ya calculados en este proceso: (ruta, mtime, tamaño) -> hash
+_hash_memo = {}
+
+
+def dataset_hash(csv_path):
+    """
+    Hash del contenido del CSV, calculado una sola vez por proceso
+    """
+    stat = os.stat(csv_path)
+    key = (os.path.abspath(csv_path), stat.st_mtime_ns, stat.st_size)
+    if key not in _hash_memo:
+        _hash_memo[key] = DatasetCache().file_hash(csv_path)
+    return _hash_memo[key]
+
+
+def compact_chunk(chunk):
+    """
+    Reducir las columnas enteras de un bloque a int8/int16 (float32 si tienen nulos o decimales)
+    """
+    import pandas as pd
+
+    for col, int_dtype in INTEGER_COLUMNS.items():
+        if col not in chunk.columns:
+            continue
+        values = pd.to_numeric(chunk[col], errors='coerce')
+        if values.notna().all() and (values % 1 == 0).all():
+            chunk[col] = values.astype(int_dtype)
+        else:
+            chunk[col] = values.astype('float32')
+    return chunk
+
+
+def iter_dataset_chunks(csv_path, columns=None, chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Iterar el CSV por bloques tipados. Si se indican columnas, solo se leen esas
+    (las que falten en el archivo simplemente no aparecen en los bloques).
+    """
+    import pandas as pd
+
+    usecols = None
+    if columns is not None:
+        wanted = set(columns)
+        usecols = lambda col: col in wanted
+
+    reader = pd.read_csv(csv_path, usecols=usecols, dtype=CSV_DTYPES,
+                         chunksize=chunksize, low_memory=False)
+    for chunk in reader:
+        yield compact_chunk(chunk)
+
+
+def drop_incomplete_rows(df, columns):
+    """
+    Eliminar las filas con nulos en las columnas indicadas; sin nulos se devuelve
+    el mismo DataFrame, sin copiarlo
+    """
+    if any(df[col].hasnans for col in columns):
+        return df.dropna(subset=columns)
+    return df
+
+
+def present_categories(series):
+    """
+    Valores distintos (como texto) presentes en una columna. En columnas category se
+    marcan los códigos usados en lugar de recodificar la columna entera
+    (remove_unused_categories reserva varios arrays int64 del largo de la columna).
+    """
+    import pandas as pd
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        used = np.zeros(len(categories) + 1, dtype=bool)
+        # El código -1 (nulo) marca la posición extra del final
+        used[series.cat.codes.to_numpy()] = True
+        return categories[used[:-1]].astype(str)
+    return pd.Index(series.unique()).astype(str)
+
+
+def iter_dataset_source(csv_path, columns=None, chunksize=DEFAULT_CHUNK_SIZE, use_cache=True):
+    """
+    Iterar el dataset por bloques desde su copia columnar si ya está en caché, o desde
+    el CSV si no. A diferencia de read_dataset nunca reúne el dataset completo en memoria.
+    """
+    cache = DatasetCache() if use_cache else None
+    if cache is not None and cache.available:
+        chunks = cache.iter_chunks(dataset_hash(csv_path), columns=columns, chunksize=chunksize)
+        if chunks is not None:
+            return chunks
+    return iter_dataset_chunks(csv_path, columns=columns, chunksize=chunksize)
+
+
+def concat_chunks(chunks):
+    """
+    Unir bloques conservando el tipo category aunque cada bloque tenga categorías distintas
+    """
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+
+    data = {}
+    for col in chunks[0].columns:
+        parts = [chunk[col] for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            data[col] = union_categoricals(parts)
+        else:
+            data[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(data)
+
+
+def read_dataset(csv_path, columns=None, chunksize=DEFAULT_CHUNK_SIZE, use_cache=True):
+    """
+    Cargar el CSV completo en un DataFrame compacto, leyéndolo por bloques.
+    Con caché disponible, la primera lectura guarda una copia columnar y las
+    siguientes (de cualquiera de los scripts) se sirven desde ella. Si se piden
+    columnas solo se leen y se guardan esas; la copia completa, si existe, sirve
+    igualmente a cualquier subconjunto.
+    """
+    cache = DatasetCache() if use_cache else None
+    data_hash = None
+    if cache is not None and cache.available:
+        data_hash = dataset_hash(csv_path)
+        df = cache.load(data_hash, columns=columns)
+        if df is not None:
+            return df
+
+    chunks = []
+    for chunk in iter_dataset_chunks(csv_path, columns=columns, chunksize=chunksize):
+        chunks.append(chunk)
+    df = concat_chunks(chunks)
+
+    if data_hash is not None:
+        cache.store(data_hash, df, columns)
+    return df
+
+
+def split_csv_ranges(csv_path, parts):
+    """
+    Dividir el CSV en hasta `parts` rangos de bytes alineados a fin de línea para que
+    varios procesos lo lean en paralelo. Devuelve (línea de cabecera, [(inicio, fin), ...]).
+    Supone registros de una sola línea (sin saltos de línea dentro de campos entrecomillados).
+    """
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        step = max(1, (size - data_start) // max(1, parts))
+
+        boundaries = [data_start]
+        while boundaries[-1] < size:
+            f.seek(boundaries[-1] + step)
+            # Completar la línea en curso para cortar justo después de un salto de línea
+            f.readline()
+            boundaries.append(min(f.tell(), size))
+
+    return header, list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_csv_range(csv_path, header, start, end):
+    """Archivo en memoria con la cabecera y las líneas del rango [inicio, fin)"""
+    import io
+
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        return io.BytesIO(header + f.read(end - start))
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Evaluación del clasificador binario con NumPy: la matriz de confusión se cuenta una
+sola vez (bincount) y todas las métricas del esquema de metrics_report.json se derivan
+de ella; el ROC-AUC sale de una única ordenación de las probabilidades.
+
+Los resultados coinciden con los de sklearn.metrics (mismas fórmulas y mismo orden de
+operaciones), sin su validación repetida de entradas en cada llamada.
+
+La misma ordenación da el barrido de umbrales (curvas PR y ROC, F1 y coste en cada
+umbral distinto) del que salen el umbral de decisión y los cortes de las bandas de
+riesgo que se guardan con el modelo. El barrido se hace sobre una validación reservada
+de las filas de entrenamiento; la partición de evaluación solo se usa para reportar,
+también con los umbrales desplegados.
+"""
+
+import os
+
+import numpy as np
+
+# Umbral de clase de XGBClassifier.predict; las métricas principales se calculan con él
+DECISION_THRESHOLD = 0.5
+
+# Umbrales de un modelo sin calibrar (p. ej. guardado antes del barrido)
+DEFAULT_THRESHOLDS = {'decision': DECISION_THRESHOLD, 'risk_high': 0.7, 'risk_medium': 0.4}
+
+# Criterio del umbral de decisión: 'f1' (máximo F1) o 'cost' (mínimo coste)
+THRESHOLD_OBJECTIVE = os.environ.get('CHURN_THRESHOLD_OBJECTIVE', 'f1')
+
+# Coste de actuar sobre un cliente que no se iba y de no detectar una fuga
+COST_FALSE_POSITIVE = float(os.environ.get('CHURN_COST_FP', '1'))
+COST_FALSE_NEGATIVE = float(os.environ.get('CHURN_COST_FN', '5'))
+
+# Tasa de fuga observada (precisión) que deben alcanzar las bandas Alto y Medio
+RISK_HIGH_PRECISION = 0.7
+RISK_MEDIUM_PRECISION = 0.4
+
+# Puntos de las curvas incluidos en el reporte (el barrido usa todos los umbrales)
+CURVE_POINTS = 101
+
+
+def divide(numerator, denominator):
+    """Cociente como float, 0.0 si el denominador es 0 (zero_division=0 de sklearn)"""
+    return float(numerator / denominator) if denominator > 0 else 0.0
+
+
+def confusion_counts(y_true, y_pred):
+    """(tn, fp, fn, tp) de etiquetas y clases 0/1 en una sola pasada"""
+    cells = np.asarray(y_true, dtype=np.intp) * 2
+    cells += np.asarray(y_pred, dtype=np.intp)
+    tn, fp, fn, tp = np.bincount(cells, minlength=4)[:4].tolist()
+    return tn, fp, fn, tp
+
+
+def binary_curve(y_true, y_score):
+    """
+    Falsos y verdaderos positivos acumulados en cada umbral distinto, de mayor a menor
+    probabilidad: (fps, tps, umbrales). Una sola ordenación de las probabilidades.
+    """
+    y_score = np.asarray(y_score)
+    order = np.argsort(y_score)[::-1]
+    scores = y_score[order]
+    # Fin de cada grupo de probabilidades iguales
+    ends = np.append(np.flatnonzero(np.diff(scores)), len(scores) - 1)
+    tps = np.cumsum(np.asarray(y_true)[order], dtype=np.float64)[ends]
+    fps = 1 + ends.astype(np.float64) - tps
+    return fps, tps, scores[ends]
+
+
+def roc_auc(y_true, y_score):
+    """Área bajo la curva ROC (0.0 si solo hay una clase)"""
+    fps, tps, _ = binary_curve(y_true, y_score)
+    if len(fps) == 0 or fps[-1] <= 0 or tps[-1] <= 0:
+        return 0.0
+
+    # Sin los puntos intermedios colineales, igual que roc_curve
+    if len(fps) > 2:
+        bends = (np.diff(fps, 2) != 0) | (np.diff(tps, 2) != 0)
+        corners = np.flatnonzero(np.concatenate([[True], bends, [True]]))
+        fps, tps = fps[corners], tps[corners]
+
+    fpr = np.concatenate([[0.0], fps]) / fps[-1]
+    tpr = np.concatenate([[0.0], tps]) / tps[-1]
+    return float((np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2.0).sum())
+
+
+def threshold_sweep(y_true, y_score, cost_fp=COST_FALSE_POSITIVE, cost_fn=COST_FALSE_NEGATIVE):
+    """
+    Métricas en cada umbral distinto con la regla de decisión 'probabilidad > umbral',
+    de mayor a menor umbral. El primer punto no marca a nadie y el último a todos; el
+    umbral de cada punto intermedio es la siguiente probabilidad distinta menor, de modo
+    que reproduce exactamente esa partición del test.
+    """
+    fps, tps, scores = binary_curve(y_true, y_score)
+    # En el dtype de las probabilidades: la comparación con el umbral se hace en él
+    lowest = np.nextafter(scores[-1], np.array(-np.inf, dtype=scores.dtype))
+    thresholds = np.append(scores, lowest).astype(np.float64)
+    fps = np.concatenate([[0.0], fps])
+    tps = np.concatenate([[0.0], tps])
+    positives, negatives = tps[-1], fps[-1]
+
+    predicted = tps + fps
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Sin nadie marcado la precisión se toma como 1 (como precision_recall_curve)
+        precision = np.where(predicted > 0, tps / predicted, 1.0)
+        recall = tps / positives
+        false_positive_rate = fps / negatives
+        f1 = 2 * tps / (predicted + positives)
+    return {
+        'threshold': thresholds,
+        'precision': precision,
+        'recall': recall,
+        'false_positive_rate': false_positive_rate,
+        'f1_score': f1,
+        'cost': fps * cost_fp + (positives - tps) * cost_fn,
+        'predicted_positive': predicted
+    }
+
+
+def sweep_point(sweep, index):
+    """Métricas de un punto del barrido"""
+    return {name: float(values[index]) for name, values in sweep.items()}
+
+
+def lowest_threshold_with_precision(sweep, target):
+    """
+    Menor umbral cuya precisión alcanza target (la banda cubre a más clientes);
+    1.0 si ninguno la alcanza (banda vacía)
+    """
+    reached = np.flatnonzero(sweep['precision'][1:] >= target)
+    return float(sweep['threshold'][1 + reached[-1]]) if len(reached) else 1.0
+
+
+def threshold_analysis(y_true, y_score, objective=THRESHOLD_OBJECTIVE):
+    """
+    Sección 'threshold_analysis': umbral de decisión según el objetivo, cortes de las
+    bandas de riesgo por tasa de fuga observada y curvas PR/ROC muestreadas, elegidos
+    sobre las probabilidades dadas (la validación). Sus métricas son las de esa partición.
+    """
+    sweep = threshold_sweep(y_true, y_score)
+    # Con una sola clase en el test no hay nada que calibrar
+    if np.isnan(sweep['recall'][-1]) or np.isnan(sweep['false_positive_rate'][-1]):
+        return {'calibrated': False, 'thresholds': dict(DEFAULT_THRESHOLDS)}
+
+    best_f1 = int(np.argmax(sweep['f1_score']))
+    min_cost = int(np.argmin(sweep['cost']))
+    decision = min_cost if objective == 'cost' else best_f1
+
+    # Como con los cortes fijos, todo cliente marcado como fuga queda al menos en riesgo Medio
+    decision_threshold = float(sweep['threshold'][decision])
+    risk_medium = min(lowest_threshold_with_precision(sweep, RISK_MEDIUM_PRECISION), decision_threshold)
+    risk_high = max(lowest_threshold_with_precision(sweep, RISK_HIGH_PRECISION), risk_medium)
+
+    curve = np.unique(np.linspace(0, len(sweep['threshold']) - 1, CURVE_POINTS).round().astype(np.intp))
+    return {
+        'calibrated': True,
+        'objective': 'cost' if objective == 'cost' else 'f1',
+        'costs': {'false_positive': COST_FALSE_POSITIVE, 'false_negative': COST_FALSE_NEGATIVE},
+        'thresholds': {
+            'decision': decision_threshold,
+            'risk_high': risk_high,
+            'risk_medium': risk_medium
+        },
+        'operating_point': sweep_point(sweep, decision),
+        'best_f1': sweep_point(sweep, best_f1),
+        'min_cost': sweep_point(sweep, min_cost),
+        'evaluated_thresholds': len(sweep['threshold']),
+        'curve': {name: values[curve].tolist() for name, values in sweep.items()}
+    }
+
+
+def class_scores(tp, fp, fn):
+    """Precisión, recall y F1 de una clase a partir de sus conteos"""
+    return divide(tp, tp + fp), divide(tp, tp + fn), divide(2 * tp, 2 * tp + fp + fn)
+
+
+def metrics_at_thresholds(y_true, y_score, thresholds):
+    """
+    Comportamiento desplegado: métricas con el umbral de decisión guardado y, por banda
+    de riesgo, clientes y tasa de fuga observada
+    """
+    y_true = np.asarray(y_true)
+    y_score = np.asarray(y_score)
+    metrics = evaluate_predictions(y_true, y_score > thresholds['decision'], y_score)
+    high = y_score > thresholds['risk_high']
+    medium = (y_score > thresholds['risk_medium']) & ~high
+    bands = {}
+    for band, mask in (('Alto', high), ('Medio', medium), ('Bajo', ~(high | medium))):
+        count = int(np.count_nonzero(mask))
+        bands[band] = {'clientes': count, 'tasa_fuga': divide(int(np.count_nonzero(y_true[mask])), count)}
+    return {
+        'decision_threshold': float(thresholds['decision']),
+        'accuracy': metrics['accuracy'],
+        'precision': metrics['precision'],
+        'recall': metrics['recall'],
+        'f1_score': metrics['f1_score'],
+        'confusion_matrix': metrics['confusion_matrix'],
+        'risk_bands': bands
+    }
+
+
+def calibrated_threshold_analysis(y_test, test_proba, y_valid=None, valid_proba=None):
+    """
+    Sección 'threshold_analysis' con los umbrales elegidos sobre la validación (sobre el
+    test solo si no hay validación) y las métricas del test con esos umbrales
+    """
+    has_validation = y_valid is not None and len(y_valid) > 0
+    if has_validation:
+        analysis = threshold_analysis(y_valid, valid_proba)
+    else:
+        analysis = threshold_analysis(y_test, test_proba)
+    analysis['calibration_split'] = 'validation' if has_validation else 'test'
+    analysis['calibration_size'] = int(len(y_valid) if has_validation else len(y_test))
+    analysis['test_at_thresholds'] = metrics_at_thresholds(y_test, test_proba, analysis['thresholds'])
+    return analysis
+
+
+def evaluate_model(model, X_test, y_test, X_valid=None, y_valid=None):
+    """
+    Métricas de evaluación en el esquema de metrics_report.json, con una sola
+    predicción: la clase es la probabilidad por encima de DECISION_THRESHOLD,
+    como en model.predict. Incluye el barrido de umbrales sobre la validación
+    (X_valid, y_valid) y las métricas del test con los umbrales elegidos.
+    """
+    y_proba = model.predict_proba(X_test)[:, 1]
+    metrics = evaluate_predictions(y_test, y_proba > DECISION_THRESHOLD, y_proba)
+    valid_proba = model.predict_proba(X_valid)[:, 1] if y_valid is not None and len(y_valid) else None
+    metrics['threshold_analysis'] = calibrated_threshold_analysis(y_test, y_proba, y_valid, valid_proba)
+    return metrics
+
+
+def evaluate_predictions(y_test, y_pred, y_proba):
+    """
+    Métricas de evaluación a partir de etiquetas, clases predichas y probabilidades
+    (p. ej. acumuladas por bloques en el entrenamiento fuera de memoria)
+    """
+    tn, fp, fn, tp = confusion_counts(y_test, y_pred)
+    precision, recall, f1 = class_scores(tp, fp, fn)
+    # Clase 0: los negativos hacen de positivos
+    precision_0, recall_0, f1_0 = class_scores(tn, fn, fp)
+
+    return {
+        'accuracy': divide(tn + tp, tn + fp + fn + tp),
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1,
+        'roc_auc': roc_auc(y_test, y_proba),
+        'confusion_matrix': {
+            'true_negative': tn,
+            'false_positive': fp,
+            'false_negative': fn,
+            'true_positive': tp
+        },
+        'additional_metrics': {
+            'specificity': recall_0,
+            'sensitivity': recall,
+            'false_positive_rate': divide(fp, fp + tn),
+            'false_negative_rate': divide(fn, fn + tp)
+        },
+        'classification_report': {
+            '0': {'precision': precision_0, 'recall': recall_0, 'f1-score': f1_0},
+            '1': {'precision': precision, 'recall': recall, 'f1-score': f1}
+        }
+    }
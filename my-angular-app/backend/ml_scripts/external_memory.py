@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Entrenamiento fuera de memoria: los bloques del dataset (codificados y escalados uno a
+uno) se entregan a XGBoost con un DataIter y la matriz cuantizada se guarda en disco
+(ExtMemQuantileDMatrix, o un DMatrix paginado con XGBoost < 3.0). El pico de memoria
+depende del tamaño de bloque, no del dataset.
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from churn_pipeline import CALIBRATION_SIZE, RANDOM_STATE, TEST_SIZE, build_model
+
+# Filas por bloque entregado a XGBoost
+EXTERNAL_CHUNK_ROWS = int(os.environ.get('CHURN_EXTERNAL_CHUNK_ROWS', '250000'))
+
+
+def row_masks(n_rows, chunk_index):
+    """
+    Filas de evaluación y de validación de un bloque: sorteo reproducible por bloque
+    (mismas proporciones TEST_SIZE y CALIBRATION_SIZE que la partición en memoria),
+    idéntico en cada pasada sobre el dataset
+    """
+    rng = np.random.default_rng([RANDOM_STATE, chunk_index])
+    draw = rng.random(n_rows)
+    test_mask = draw < TEST_SIZE
+    valid_mask = ~test_mask & (draw < TEST_SIZE + (1 - TEST_SIZE) * CALIBRATION_SIZE)
+    return test_mask, valid_mask
+
+
+def chunk_iterator(batches, cache_prefix):
+    """
+    DataIter de XGBoost sobre `batches`, una función que devuelve un generador nuevo de
+    (X, y) por bloque; XGBoost recorre el iterador varias veces y reset lo relanza
+    """
+    import xgboost as xgb
+
+    class ChunkIter(xgb.DataIter):
+        def __init__(self):
+            self.batches = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self.batches is None:
+                self.batches = batches()
+            batch = next(self.batches, None)
+            if batch is None:
+                return False
+            X, y = batch
+            input_data(data=X, label=y)
+            return True
+
+        def reset(self):
+            self.batches = None
+
+    return ChunkIter()
+
+
+def train_external(batches, n_jobs=None, max_bin=None, tuned=None, work_dir=None):
+    """
+    Entrenar con la configuración compartida sobre los bloques de `batches` y devolver
+    un XGBClassifier equivalente al de fit(). La caché de páginas se borra al terminar.
+    """
+    import xgboost as xgb
+
+    model = build_model(n_jobs, max_bin, tuned)
+    params = model.get_xgb_params()
+
+    cache_dir = tempfile.mkdtemp(prefix='extmem-', dir=work_dir)
+    try:
+        iterator = chunk_iterator(batches, os.path.join(cache_dir, 'pages'))
+        if hasattr(xgb, 'ExtMemQuantileDMatrix'):
+            data = xgb.ExtMemQuantileDMatrix(iterator, max_bin=params['max_bin'], nthread=params['n_jobs'])
+        else:
+            # XGBoost < 3.0 (la versión fijada en install-python-deps.ps1): con cache_prefix
+            # el DMatrix sobre el iterador guarda sus páginas en disco; max_bin va en params
+            data = xgb.DMatrix(iterator, nthread=params['n_jobs'])
+        booster = xgb.train(params, data, num_boost_round=model.n_estimators)
+        del data
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    model.load_model(bytearray(booster.save_raw('ubj')))
+    return model
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Búsqueda de hiperparámetros con presupuesto de tiempo: successive halving sobre
+configuraciones aleatorias (más la configuración actual como referencia).
+
+Todas las pruebas comparten las mismas matrices cuantizadas de XGBoost, construidas
+una sola vez, y corren en hilos en paralelo (XGBoost libera el GIL mientras entrena),
+cada una con early stopping sobre la partición de validación.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from churn_pipeline import RANDOM_STATE
+
+# Presupuesto total en segundos y configuraciones de la primera ronda
+TUNE_BUDGET_SECONDS = float(os.environ.get('CHURN_TUNE_BUDGET', '300'))
+TUNE_TRIALS = int(os.environ.get('CHURN_TUNE_TRIALS', '27'))
+
+# Árboles de la primera ronda y máximo de la última; cada ronda conserva 1/HALVING_FACTOR
+# de las configuraciones y multiplica sus árboles por HALVING_FACTOR
+TUNE_MIN_ROUNDS = int(os.environ.get('CHURN_TUNE_MIN_ROUNDS', '30'))
+TUNE_MAX_ROUNDS = int(os.environ.get('CHURN_TUNE_MAX_ROUNDS', '500'))
+HALVING_FACTOR = 3
+
+# Árboles sin mejorar el AUC de validación antes de detener una prueba
+EARLY_STOPPING_ROUNDS = 20
+
+# Espacio de búsqueda: parámetro -> (mínimo, máximo, escala)
+SEARCH_SPACE = {
+    'max_depth': (2, 8, 'int'),
+    'learning_rate': (0.02, 0.3, 'log'),
+    'subsample': (0.6, 1.0, 'linear'),
+    'colsample_bytree': (0.5, 1.0, 'linear'),
+    'min_child_weight': (1.0, 32.0, 'log'),
+    'reg_lambda': (0.1, 10.0, 'log')
+}
+
+
+def sample_config(rng):
+    """Configuración aleatoria del espacio de búsqueda"""
+    config = {}
+    for name, (low, high, scale) in SEARCH_SPACE.items():
+        if scale == 'int':
+            config[name] = int(rng.integers(low, high + 1))
+        elif scale == 'log':
+            config[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            config[name] = float(rng.uniform(low, high))
+    return config
+
+
+def initial_candidates(trials, current_params):
+    """La configuración actual seguida de trials - 1 aleatorias (reproducibles)"""
+    rng = np.random.default_rng(RANDOM_STATE)
+    current = {name: current_params[name] for name in SEARCH_SPACE if name in current_params}
+    return [current] + [sample_config(rng) for _ in range(max(0, trials - 1))]
+
+
+def deadline_callback(deadline):
+    """Callback que detiene el entrenamiento al agotarse el presupuesto"""
+    import xgboost as xgb
+
+    class Deadline(xgb.callback.TrainingCallback):
+        def after_iteration(self, model, epoch, evals_log):
+            return time.monotonic() >= deadline
+
+    return Deadline()
+
+
+def run_trial(config, rounds, dtrain, dvalid, base_params, deadline):
+    """
+    Entrenar una configuración con early stopping; None si el presupuesto ya se agotó
+    antes de empezar
+    """
+    import xgboost as xgb
+
+    if time.monotonic() >= deadline:
+        return None
+
+    start = time.perf_counter()
+    history = {}
+    xgb.train(dict(base_params, **config, eval_metric='auc'), dtrain, num_boost_round=rounds,
+              evals=[(dvalid, 'validation')], early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+              evals_result=history, verbose_eval=False, callbacks=[deadline_callback(deadline)])
+
+    auc = history['validation']['auc']
+    best_iteration = int(np.argmax(auc))
+    return {
+        'params': config,
+        'rounds': rounds,
+        'trained_rounds': len(auc),
+        'best_iteration': best_iteration,
+        'validation_auc': float(auc[best_iteration]),
+        'stopped_by_budget': time.monotonic() >= deadline,
+        'seconds': time.perf_counter() - start
+    }
+
+
+def successive_halving(dtrain, dvalid, base_params, current_params, budget_seconds=TUNE_BUDGET_SECONDS,
+                       trials=TUNE_TRIALS, workers=1, min_rounds=TUNE_MIN_ROUNDS, max_rounds=TUNE_MAX_ROUNDS):
+    """
+    Ejecutar la búsqueda y devolver (mejor prueba, todas las pruebas). Las pruebas de
+    una ronda corren en `workers` hilos; base_params fija el resto de la configuración
+    (objetivo, hilos por prueba, max_bin, semilla).
+    """
+    deadline = time.monotonic() + budget_seconds
+    candidates = initial_candidates(trials, current_params)
+    current = candidates[0]
+    rounds = min(min_rounds, max_rounds)
+    results = []
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for rung in range(len(candidates)):
+            futures = [pool.submit(run_trial, config, rounds, dtrain, dvalid, base_params, deadline)
+                       for config in candidates]
+            rung_results = [result for result in (future.result() for future in futures) if result]
+            for result in rung_results:
+                result['rung'] = rung
+                result['current_config'] = result['params'] is current
+            results.extend(rung_results)
+            print(f"[TUNE] Ronda {rung}: {len(rung_results)} pruebas con hasta {rounds} árboles"
+                  + (f", mejor AUC {max(r['validation_auc'] for r in rung_results):.4f}" if rung_results else ""))
+
+            if time.monotonic() >= deadline or rounds >= max_rounds or len(rung_results) <= 1:
+                break
+            # Las mejores pasan a la siguiente ronda con más árboles
+            rung_results.sort(key=lambda result: result['validation_auc'], reverse=True)
+            candidates = [result['params'] for result in rung_results[:max(1, len(rung_results) // HALVING_FACTOR)]]
+            rounds = min(max_rounds, rounds * HALVING_FACTOR)
+
+    if not results:
+        raise ValueError("El presupuesto de tiempo no alcanzó para completar ninguna prueba")
+    # Con empate en AUC se prefiere la prueba de una ronda posterior (más árboles evaluados)
+    best = max(results, key=lambda result: (result['validation_auc'], result['rung']))
+    return best, results
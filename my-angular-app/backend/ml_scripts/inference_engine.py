@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Motor de inferencia ligero para predicciones individuales: del diccionario del cliente
+a una fila float32 preasignada y una sola llamada al booster nativo de XGBoost,
+sin pasar por pandas ni por los envoltorios de sklearn
+"""
+
+import numpy as np
+
+
+class InferenceEngine:
+    """
+    Constantes precalculadas (códigos de categorías, media y escala) de un modelo cargado.
+    La fila preasignada se reutiliza entre llamadas: usar un motor por hilo o bajo un lock.
+    """
+
+    def __init__(self, model, encoders, scaler, feature_columns, numerical_features):
+        self.booster = model.get_booster()
+        self.feature_columns = list(feature_columns)
+        self.row = np.empty((1, len(self.feature_columns)), dtype=np.float32)
+
+        scaler_columns = [col for col in numerical_features if col in self.feature_columns]
+        scaler_index = {col: i for i, col in enumerate(scaler_columns)}
+
+        # Un convertidor por columna, en el orden de entrenamiento
+        self.converters = []
+        for col in self.feature_columns:
+            if col in encoders:
+                codes = {category: float(code) for code, category in enumerate(encoders[col].classes_)}
+                self.converters.append(('category', col, codes))
+            elif col in scaler_index:
+                i = scaler_index[col]
+                # En float32, como StandardScaler.transform sobre la matriz float32 del entrenamiento
+                self.converters.append(('scaled', col, (np.float32(scaler.mean_[i]), np.float32(scaler.scale_[i]))))
+            else:
+                self.converters.append(('raw', col, None))
+
+    def fill_row(self, customer_data, row=None):
+        """Escribir las features del cliente en la fila indicada (por defecto, la preasignada)"""
+        if row is None:
+            row = self.row[0]
+        for i, (kind, col, constants) in enumerate(self.converters):
+            value = customer_data.get(col)
+            if kind == 'category':
+                # Categorías no vistas o ausentes: valor faltante (rama por defecto)
+                row[i] = constants.get(str(value), np.nan)
+            elif value is None:
+                row[i] = np.nan
+            elif kind == 'scaled':
+                mean, scale = constants
+                row[i] = (np.float32(float(value)) - mean) / scale
+            else:
+                row[i] = float(value)
+        return row
+
+    def predict_proba(self, customer_data):
+        """Probabilidad de deserción con una única inferencia"""
+        self.fill_row(customer_data)
+        return self.predict_filled_row()
+
+    def predict_filled_row(self):
+        """Probabilidad para la fila ya escrita por fill_row"""
+        return float(self.booster.inplace_predict(self.row)[0])
+
+    def predict_rows(self, X):
+        """Probabilidades para una matriz float32 de filas ya preparadas, en una sola llamada"""
+        return self.booster.inplace_predict(X)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Planificador asyncio de micro-lotes: agrupa peticiones individuales concurrentes
+durante una ventana corta (o hasta llenar el lote), las puntúa como una sola
+matriz y devuelve a cada llamador su resultado
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Tamaño máximo del lote, espera máxima para llenarlo y peticiones en cola admitidas
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get('CHURN_MAX_BATCH_SIZE', '256'))
+DEFAULT_MAX_WAIT_MS = float(os.environ.get('CHURN_BATCH_WINDOW_MS', '2'))
+DEFAULT_MAX_QUEUE_DEPTH = int(os.environ.get('CHURN_MAX_QUEUE_DEPTH', '4096'))
+
+# Peticiones sin responder por conexión: al alcanzarlas se deja de leer de esa conexión
+DEFAULT_MAX_INFLIGHT = int(os.environ.get('CHURN_MAX_INFLIGHT', '64'))
+
+
+class MicroBatchScheduler:
+    """
+    score_batch recibe una lista de peticiones y devuelve una lista de resultados del
+    mismo largo. Se ejecuta en un hilo aparte para que el bucle siga aceptando
+    peticiones (y formando el siguiente lote) mientras se puntúa el actual.
+    """
+
+    def __init__(self, score_batch, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, max_queue_depth=DEFAULT_MAX_QUEUE_DEPTH,
+                 max_inflight=DEFAULT_MAX_INFLIGHT):
+        self.score_batch = score_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.queue = asyncio.Queue(maxsize=max(0, int(max_queue_depth)))
+        # Una sola conexión nunca llena la cola: solo la rechazan varias a la vez
+        max_inflight = max(1, int(max_inflight))
+        self.max_inflight = min(max_inflight, self.queue.maxsize) if self.queue.maxsize > 0 else max_inflight
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.worker = None
+        self.batches = 0
+        self.requests = 0
+        self.rejected = 0
+
+    def start(self):
+        """Arrancar el bucle de lotes (dentro de un event loop en ejecución)"""
+        if self.worker is None:
+            self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Detener el bucle; las peticiones aún en cola se cancelan"""
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            future.cancel()
+        self.executor.shutdown(wait=True)
+
+    async def submit(self, request):
+        """
+        Encolar una petición y esperar su resultado. Con la cola llena (sobrecarga de
+        todas las conexiones juntas) se lanza asyncio.QueueFull de inmediato en lugar de
+        acumular latencia; el ritmo de cada conexión lo limita max_inflight.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((request, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        return await future
+
+    async def _collect(self):
+        """Esperar la primera petición y completar el lote hasta el tamaño o la ventana"""
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Primero lo que ya está en cola, sin esperar
+            while len(batch) < self.max_batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            remaining = deadline - loop.time()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Descartar peticiones cuyo llamador ya no espera
+            batch = [(request, future) for request, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            requests = [request for request, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.score_batch, requests)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        """Contadores para monitorización"""
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'queue_depth': self.queue.qsize(),
+            'max_queue_depth': self.queue.maxsize,
+            'max_inflight': self.max_inflight,
+            'rejected': self.rejected,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000
+        }
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Bundle de modelo en un solo archivo versionado: booster XGBoost (UBJSON nativo)
+más encoders, scaler y columnas en JSON compacto.
+
+Formato: MAGIC | longitud del JSON (8 bytes little-endian) | JSON | bytes del booster
+"""
+
+import glob
+import json
+import os
+import re
+import struct
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+MAGIC = b'CHURNMB1'
+BUNDLE_FORMAT_VERSION = 1
+
+BUNDLE_FILE = 'churn_model.bundle'
+VERSIONS_DIR = 'versions'
+
+# Versiones anteriores que se conservan para rollback inmediato
+DEFAULT_KEEP_VERSIONS = int(os.environ.get('CHURN_MODEL_KEEP_VERSIONS', '5'))
+
+# Claves de la cabecera que no forman parte de los metadatos del modelo
+PAYLOAD_KEYS = ('encoders', 'scaler', 'feature_columns', 'tree_ensemble')
+
+_HEADER = struct.Struct('<8sQ')
+_VERSION_PATTERN = re.compile(r'churn_model\.v(\d+)\.bundle$')
+
+
+def booster_bytes(model):
+    """Serializar el clasificador en UBJSON nativo (incluye los metadatos de sklearn)"""
+    fd, tmp_path = tempfile.mkstemp(suffix='.ubj')
+    os.close(fd)
+    try:
+        model.save_model(tmp_path)
+        with open(tmp_path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(tmp_path)
+
+
+def encode_bundle(model, encoders, scaler, feature_columns, scaler_columns, metadata):
+    """
+    Construir los bytes del bundle. scaler_columns son las columnas numéricas en el
+    orden de las medias y escalas del scaler (un scaler ajustado sobre una matriz
+    NumPy no guarda sus nombres).
+    """
+    scaler_columns = [str(col) for col in scaler_columns]
+    if len(scaler_columns) != len(scaler.mean_):
+        raise ValueError(f"El scaler tiene {len(scaler.mean_)} columnas y se indicaron {len(scaler_columns)}")
+
+    header = dict(metadata)
+    header.update({
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'feature_columns': list(feature_columns),
+        'encoders': {col: [str(c) for c in encoder.classes_] for col, encoder in encoders.items()},
+        'scaler': {
+            'columns': scaler_columns,
+            'mean': scaler.mean_.tolist(),
+            'scale': scaler.scale_.tolist(),
+            'var': scaler.var_.tolist(),
+            # Escalar, o una cuenta por columna si hubo valores faltantes
+            'n_samples_seen': np.asarray(scaler.n_samples_seen_).tolist()
+        }
+    })
+    header_bytes = json.dumps(header, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return _HEADER.pack(MAGIC, len(header_bytes)) + header_bytes + booster_bytes(model)
+
+
+def decode_bundle(data):
+    """
+    Reconstruir (model, encoders, scaler, feature_columns, metadata) desde los bytes del bundle
+    """
+    # Solo aquí hacen falta sklearn y xgboost: leer la cabecera no los importa
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    import xgboost as xgb
+
+    magic, header_length = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Archivo de modelo no reconocido (firma inválida)")
+
+    start = _HEADER.size
+    header = json.loads(data[start:start + header_length].decode('utf-8'))
+    if header.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Versión de bundle no soportada: {header.get('format_version')}")
+
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(data[start + header_length:]))
+
+    encoders = {}
+    for col, classes in header['encoders'].items():
+        encoder = LabelEncoder()
+        encoder.classes_ = np.array(classes, dtype=object)
+        encoders[col] = encoder
+
+    scaler_state = header['scaler']
+    scaler = StandardScaler()
+    scaler.mean_ = np.array(scaler_state['mean'])
+    scaler.scale_ = np.array(scaler_state['scale'])
+    scaler.var_ = np.array(scaler_state['var'])
+    scaler.n_features_in_ = len(scaler.mean_)
+    n_samples_seen = scaler_state['n_samples_seen']
+    # partial_fit espera los tipos de NumPy que deja fit (escalar int64 o arreglo)
+    scaler.n_samples_seen_ = (np.array(n_samples_seen, dtype=np.int64) if isinstance(n_samples_seen, list)
+                              else np.int64(n_samples_seen))
+    if scaler_state['columns']:
+        scaler.feature_names_in_ = np.array(scaler_state['columns'], dtype=object)
+
+    metadata = {key: value for key, value in header.items() if key not in PAYLOAD_KEYS}
+    return model, encoders, scaler, header['feature_columns'], metadata
+
+
+def read_bundle(path):
+    """Leer y decodificar un bundle con una sola lectura"""
+    with open(path, 'rb') as f:
+        return decode_bundle(f.read())
+
+
+def read_bundle_header(path):
+    """Leer solo la cabecera JSON completa del bundle (sin el booster)"""
+    with open(path, 'rb') as f:
+        head = f.read(_HEADER.size)
+        magic, header_length = _HEADER.unpack(head) if len(head) == _HEADER.size else (None, 0)
+        if magic != MAGIC:
+            raise ValueError("Archivo de modelo no reconocido (firma inválida)")
+        return json.loads(f.read(header_length).decode('utf-8'))
+
+
+def read_bundle_metadata(path):
+    """Metadatos del bundle (versión, parámetros...) sin encoders, scaler ni árboles"""
+    header = read_bundle_header(path)
+    return {key: value for key, value in header.items() if key not in PAYLOAD_KEYS}
+
+
+def write_atomic(path, data):
+    """Escribir en un temporal del mismo directorio y renombrar: nadie ve un archivo a medias"""
+    directory = os.path.dirname(path) or '.'
+    # El temporal lleva la extensión del destino (.bundle, .json...)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.splitext(path)[1])
+    try:
+        # mkstemp crea el archivo solo legible por el dueño; el servidor Node también lo lee
+        os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def list_versions(model_dir):
+    """Versiones guardadas, ordenadas de la más antigua a la más reciente"""
+    versions = []
+    for path in glob.glob(os.path.join(model_dir, VERSIONS_DIR, 'churn_model.v*.bundle')):
+        match = _VERSION_PATTERN.search(path)
+        if match:
+            versions.append((int(match.group(1)), path))
+    return sorted(versions)
+
+
+def version_path(model_dir, version):
+    return os.path.join(model_dir, VERSIONS_DIR, f'churn_model.v{version}.bundle')
+
+
+def save_versioned(model_dir, model, encoders, scaler, feature_columns, scaler_columns, metadata=None,
+                   keep_versions=DEFAULT_KEEP_VERSIONS):
+    """
+    Guardar un bundle nuevo: copia versionada en versions/ y publicación atómica como
+    modelo actual. Sin versiones (keep_versions=0) solo se escribe el bundle actual.
+    """
+    metadata = dict(metadata or {})
+    versions = list_versions(model_dir)
+    version = versions[-1][0] + 1 if versions else 1
+    metadata['version'] = version
+    metadata['created_at'] = datetime.now().isoformat()
+
+    data = encode_bundle(model, encoders, scaler, feature_columns, scaler_columns, metadata)
+
+    if keep_versions > 0:
+        os.makedirs(os.path.join(model_dir, VERSIONS_DIR), exist_ok=True)
+        write_atomic(version_path(model_dir, version), data)
+        # Podar versiones antiguas (la actual siempre se conserva)
+        for _, old_path in list_versions(model_dir)[:-keep_versions]:
+            os.remove(old_path)
+
+    write_atomic(os.path.join(model_dir, BUNDLE_FILE), data)
+    return version
+
+
+def rollback(model_dir, version=None):
+    """
+    Publicar de nuevo una versión anterior (por defecto, la previa a la actual; sin
+    modelo actual, la última guardada)
+    """
+    versions = list_versions(model_dir)
+    if not versions:
+        raise ValueError("No hay versiones guardadas")
+
+    if version is None:
+        bundle_path = os.path.join(model_dir, BUNDLE_FILE)
+        current = read_bundle_metadata(bundle_path).get('version') if os.path.exists(bundle_path) else None
+        previous = [v for v, _ in versions if current is None or v < current]
+        if not previous:
+            raise ValueError("No hay una versión anterior a la actual")
+        version = previous[-1]
+
+    path = version_path(model_dir, int(version))
+    if not os.path.exists(path):
+        raise ValueError(f"La versión {version} no existe")
+
+    with open(path, 'rb') as f:
+        write_atomic(os.path.join(model_dir, BUNDLE_FILE), f.read())
+    return int(version)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Caché de predicciones individuales con expulsión LRU y caducidad (TTL), indexada
+por el vector de features normalizado y la versión del modelo
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Entradas máximas (0 desactiva la caché) y segundos de vida de cada una
+DEFAULT_MAX_ENTRIES = int(os.environ.get('CHURN_PREDICTION_CACHE_SIZE', '10000'))
+DEFAULT_TTL_SECONDS = float(os.environ.get('CHURN_PREDICTION_CACHE_TTL', '300'))
+
+
+class PredictionCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """Resultado guardado para la clave, o None si no está o caducó"""
+        if not self.enabled:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, result = entry
+            if time.monotonic() >= expires_at:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        """Guardar un resultado, expulsando el usado hace más tiempo si se supera el tamaño"""
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Invalidar todas las entradas (p. ej. al cambiar el modelo)"""
+        with self.lock:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+
+    def stats(self):
+        """Contadores para monitorización"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Perfilado ligero por fases (tiempo, RSS pico y tracemalloc) para entrenamiento y análisis
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Modo por defecto: 'off', 'time' (tiempos + RSS) o 'memory' (además tracemalloc)
+DEFAULT_PROFILE_MODE = os.environ.get('CHURN_PROFILE', 'off')
+
+
+def peak_rss_mb():
+    """RSS máximo del proceso en MB, o None si la plataforma no lo expone"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class _Phase:
+    """Contexto de una fase; mide siempre el tiempo y, si el perfilado está activo, la memoria"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.child_traced_peak = 0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        profiler = self.profiler
+        if profiler.stack:
+            self.name = f'{profiler.stack[-1].name}/{self.name}'
+        profiler.stack.append(self)
+        if profiler.mode == 'memory':
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        profiler = self.profiler
+        elapsed = self.elapsed = time.perf_counter() - self.start
+        profiler.stack.pop()
+
+        if profiler.enabled:
+            record = {'seconds': float(elapsed), 'peak_rss_mb': peak_rss_mb()}
+            if profiler.mode == 'memory':
+                # El pico de una fase incluye el de sus subfases (que reinician el contador)
+                _, traced_peak = tracemalloc.get_traced_memory()
+                traced_peak = max(traced_peak, self.child_traced_peak)
+                if profiler.stack:
+                    parent = profiler.stack[-1]
+                    parent.child_traced_peak = max(parent.child_traced_peak, traced_peak)
+                record['traced_peak_mb'] = traced_peak / (1024 * 1024)
+            profiler.records[self.name] = record
+        return False
+
+
+class Profiler:
+    def __init__(self, mode=None):
+        mode = (mode or DEFAULT_PROFILE_MODE).lower()
+        if mode in ('1', 'on', 'true'):
+            mode = 'time'
+        self.mode = mode if mode in ('time', 'memory') else 'off'
+        self.records = {}
+        self.stack = []
+        if self.mode == 'memory' and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def phase(self, name):
+        """Contexto para medir una fase: `with profiler.phase('fit'): ...`"""
+        return _Phase(self, name)
+
+    def report(self):
+        """Sección 'profiling' para el JSON de métricas, o None si está desactivado"""
+        if not self.enabled:
+            return None
+        return {
+            'mode': self.mode,
+            'phases': self.records,
+            'process_peak_rss_mb': peak_rss_mb()
+        }
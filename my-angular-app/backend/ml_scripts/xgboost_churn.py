@@ -1,58 +1,108 @@
 #!/usr/bin/env python3
 """
-Script para entrenamiento y predicción de deserción de clientes usando XGBoost
+Script para entrenamiento y predicción de deserción de clientes usando XGBoost.
+
+pandas, sklearn y xgboost se importan solo en los métodos que los necesitan, para que
+'predict' (evaluador NumPy), 'rollback' y los errores de uso arranquen sin pagarlos.
 """
 
-import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
-import xgboost as xgb
 import pickle
 import json
 import sys
 import os
 import time
+import threading
+import contextlib
 import warnings
+from profiling import Profiler, peak_rss_mb
+from inference_engine import InferenceEngine
+from prediction_cache import PredictionCache
+from tree_scorer import TreeEnsembleScorer, export_tree_ensemble
+from model_bundle import BUNDLE_FILE, DEFAULT_KEEP_VERSIONS, read_bundle, save_versioned, rollback, write_atomic
+from dataset_io import (
+    CATEGORICAL_COLUMNS, read_dataset, iter_dataset_chunks, iter_dataset_source, dataset_hash,
+    drop_incomplete_rows, present_categories, split_csv_ranges, read_csv_range
+)
+from evaluation import (
+    DECISION_THRESHOLD, DEFAULT_THRESHOLDS, calibrated_threshold_analysis, evaluate_model, evaluate_predictions
+)
+from external_memory import EXTERNAL_CHUNK_ROWS, row_masks, train_external
+from cross_validation import CV_METRICS, SharedArray, assign_folds, run_folds, summarize_folds
+from hyperparameter_search import TUNE_BUDGET_SECONDS, TUNE_TRIALS, successive_halving
+from churn_pipeline import (
+    FEATURE_COLUMNS, NUMERICAL_FEATURES, REQUIRED_COLUMNS,
+    UPDATE_ROUNDS, build_model, model_params, resolve_n_jobs, rescale_numeric_splits,
+    split_train_test_indices, training_row_order,
+    dataset_artifacts_dir, load_dataset_metrics, load_tuned_params, TUNED_PARAMS_FILE
+)
 warnings.filterwarnings('ignore')
 
+# Artefactos que componen un modelo entrenado (un único bundle versionado)
+MODEL_FILES = [BUNDLE_FILE]
+
+# Formato anterior en pickles separados, solo para lectura de modelos antiguos
+LEGACY_MODEL_FILES = ['xgboost_model.pkl', 'encoders.pkl', 'scaler.pkl', 'feature_columns.pkl']
+
+# Filas por bloque en la predicción por lotes
+BATCH_CHUNK_SIZE = 100000
+
+# Rangos del CSV por proceso en 'predict-batch --workers' (reparte mejor la carga)
+BATCH_RANGES_PER_WORKER = 4
+
+# Código para categorías no vistas en entrenamiento: se tratan como valor faltante
+# y XGBoost las envía por la rama por defecto aprendida en cada nodo
+UNKNOWN_CATEGORY_CODE = np.nan
+
+# Por debajo de este número de filas se codifica con diccionarios en lugar de Categorical
+SMALL_FRAME_ROWS = 64
+
 class CustomerChurnPredictor:
-    def __init__(self):
+    def __init__(self, n_jobs=None, max_bin=None, profiler=None):
         self.model = None
+        self.n_jobs = resolve_n_jobs(n_jobs)
+        self.max_bin = max_bin
+        self.profiler = profiler or Profiler()
         self.encoders = {}
-        self.scaler = StandardScaler()
+        self.encoding_tables = {}
+        self.scaler = None
         self.feature_columns = []
-        # Usar ruta absoluta relativa al script
+        # Umbral de decisión y cortes de las bandas de riesgo (calibrados al entrenar)
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        self.model_version = None
+        self.model_signature = None
+        self.inference_engine = None
+        self.prediction_cache = PredictionCache()
+        # Usar ruta absoluta relativa al script (CHURN_MODEL_DIR permite aislar otro directorio)
         script_dir = os.path.dirname(os.path.abspath(__file__))
-        self.model_dir = os.path.join(script_dir, 'ml_models')
+        self.model_dir = os.environ.get('CHURN_MODEL_DIR', os.path.join(script_dir, 'ml_models'))
         os.makedirs(self.model_dir, exist_ok=True)
         print(f"[INFO] Directorio de modelos: {self.model_dir}")
+        # Configuración encontrada por 'tune', si la hay
+        self.tuned_params = load_tuned_params(self.model_dir)
+        if self.tuned_params:
+            print(f"[INFO] Usando la configuración ajustada de {TUNED_PARAMS_FILE}")
         
     def load_and_preprocess_data(self, csv_path):
         """
         Cargar y preprocesar los datos del CSV con datos REALES de fuga
         """
         try:
-            # Cargar datos
-            df = pd.read_csv(csv_path, low_memory=False)
+            # Columnas esperadas (incluyendo 'fuga')
+            expected_columns = REQUIRED_COLUMNS
             
-            # Verificar que las columnas esperadas existan (incluyendo 'fuga')
-            expected_columns = [
-                'ClienteID', 'edad', 'sexo', 'estado_civil', 'nacionalidad',
-                'nivel_educativo', 'ingresos_mensuales', 'ocupacion', 
-                'nivel_riesgo_crediticio', 'tarjeta_credito', 'fuga'
-            ]
+            # Cargar solo las columnas esperadas, por bloques y con tipos compactos
+            df = read_dataset(csv_path, columns=expected_columns)
             
             missing_columns = [col for col in expected_columns if col not in df.columns]
             if missing_columns:
                 raise ValueError(f"Columnas faltantes en el CSV: {missing_columns}")
             
             # Limpiar datos (eliminar filas con valores nulos en columnas críticas)
-            df = df.dropna(subset=expected_columns)
+            df = drop_incomplete_rows(df, expected_columns)
             
             # Renombrar columna 'fuga' a 'desercion' para consistencia interna
-            df['desercion'] = df['fuga'].astype(int)
+            df['desercion'] = df['fuga'].astype('int8')
             
             # Información sobre los datos reales
             total_rows = len(df)
@@ -72,170 +122,685 @@ class CustomerChurnPredictor:
     
     def encode_categorical_features(self, df):
         """
-        Codificar variables categóricas
+        Codificar variables categóricas (in place sobre df, que también se retorna)
         """
-        categorical_columns = ['sexo', 'estado_civil', 'nacionalidad', 'nivel_educativo', 
-                              'ocupacion', 'nivel_riesgo_crediticio', 'tarjeta_credito']
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                self.ensure_encoder(col, df[col])
+                df[col] = self.apply_encoding_table(col, df[col])
         
-        df_encoded = df.copy()
+        return df
+    
+    def ensure_encoder(self, col, series):
+        """
+        Ajustar el LabelEncoder de la columna si aún no existe
+        """
+        from sklearn.preprocessing import LabelEncoder
         
-        for col in categorical_columns:
-            if col in df.columns:
-                if col not in self.encoders:
-                    self.encoders[col] = LabelEncoder()
-                    df_encoded[col] = self.encoders[col].fit_transform(df[col].astype(str))
-                else:
-                    df_encoded[col] = self.encoders[col].transform(df[col].astype(str))
+        if col in self.encoders:
+            return
+        # Basta con ajustar sobre las categorías presentes, no sobre cada fila
+        self.encoders[col] = LabelEncoder().fit(present_categories(series))
+        self.encoding_tables.pop(col, None)
+    
+    def build_feature_matrix(self, df, rows=None, out=None):
+        """
+        Matriz float32 (filas x features) con las categorías ya codificadas, escrita
+        columna a columna sin copiar ni modificar el DataFrame. rows selecciona y ordena
+        las filas (índices posicionales); out es un array ya reservado donde escribirla.
+        """
+        n_rows = len(df) if rows is None else len(rows)
+        X = np.empty((n_rows, len(self.feature_columns)), dtype=np.float32) if out is None else out
+        for j, col in enumerate(self.feature_columns):
+            if col in CATEGORICAL_COLUMNS:
+                self.ensure_encoder(col, df[col])
+                values = self.apply_encoding_table(col, df[col])
+            else:
+                values = df[col].to_numpy()
+            X[:, j] = values if rows is None else values[rows]
+        return X
+    
+    def get_encoding_table(self, col):
+        """
+        Tabla compilada categoría→código construida a partir del LabelEncoder ajustado
+        """
+        import pandas as pd
         
-        return df_encoded
+        table = self.encoding_tables.get(col)
+        if table is None:
+            classes = self.encoders[col].classes_
+            table = {
+                'categories': pd.Index(classes),
+                'codes': {category: code for code, category in enumerate(classes)}
+            }
+            self.encoding_tables[col] = table
+        return table
+    
+    def apply_encoding_table(self, col, series):
+        """
+        Traducir una columna a sus códigos; las categorías no vistas reciben UNKNOWN_CATEGORY_CODE
+        """
+        import pandas as pd
+        
+        table = self.get_encoding_table(col)
+        
+        if len(series) <= SMALL_FRAME_ROWS:
+            codes = table['codes']
+            return np.array([codes.get(str(value), UNKNOWN_CATEGORY_CODE) for value in series],
+                            dtype=np.float32)
+        
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Columna ya categórica: solo se re-mapean sus categorías, no cada fila.
+            # La última entrada de la tabla traduce el código -1 (nulo) a -1.
+            lookup = np.append(table['categories'].get_indexer(series.cat.categories.astype(str)), -1)
+            codes = lookup.astype(np.int32)[series.cat.codes.to_numpy()]
+        else:
+            if not (series.dtype == object or pd.api.types.is_string_dtype(series.dtype)):
+                series = series.astype(str)
+            codes = table['categories'].get_indexer(series)
+        
+        if (codes < 0).any():
+            encoded = codes.astype(np.float32)
+            encoded[codes < 0] = UNKNOWN_CATEGORY_CODE
+            return encoded
+        return codes
     
-    def train_model(self, csv_path):
+    def train_model(self, csv_path, external_chunk_rows=None, cv_folds=None):
         """
-        Entrenar el modelo XGBoost - versión optimizada
+        Entrenar el modelo XGBoost - versión optimizada.
+        Con external_chunk_rows el dataset se procesa por bloques de ese tamaño
+        (entrenamiento fuera de memoria) en lugar de cargarse completo. Con cv_folds
+        se añade a las métricas una validación cruzada estratificada en ese número de folds.
         """
         try:
             start_time = time.time()
             print(f"Iniciando entrenamiento con archivo: {csv_path}")
             
-            # Cargar y preprocesar datos
-            df = self.load_and_preprocess_data(csv_path)
-            if df is None:
-                return False
+            # Si el análisis ya entrenó un modelo con este mismo dataset, se adopta
+            # (salvo que se pida entrenar fuera de memoria: es otro modo de entrenamiento)
+            data_hash = dataset_hash(csv_path)
+            metrics = None if external_chunk_rows else self.adopt_dataset_model(data_hash, cv_folds)
+            if metrics:
+                print(f"[INFO] Modelo adoptado del análisis del dataset {data_hash}")
+                self.print_metrics(metrics)
+                return metrics
             
-            print(f"Datos cargados: {len(df)} filas")
+            if external_chunk_rows:
+                metrics = self.fit_external_memory(csv_path, FEATURE_COLUMNS, external_chunk_rows)
+            else:
+                # Cargar y preprocesar datos
+                with self.profiler.phase('load') as load_phase:
+                    df = self.load_and_preprocess_data(csv_path)
+                if df is None:
+                    return False
+                
+                print(f"Datos cargados: {len(df)} filas")
+                
+                metrics = self.fit_dataframe(df, FEATURE_COLUMNS)
+                metrics['throughput']['phase_times']['load'] = float(load_phase.elapsed)
+                if cv_folds:
+                    metrics['cross_validation'] = self.cross_validate(df, FEATURE_COLUMNS, cv_folds)
+            metrics['training_time'] = float(time.time() - start_time)
+            metrics['dataset_hash'] = data_hash
+            metrics['throughput']['rows_per_second'] = float(metrics['data_size'] / metrics['training_time']) if metrics['training_time'] > 0 else 0.0
             
-            # Codificar variables categóricas
-            df_encoded = self.encode_categorical_features(df)
-            print("Variables categóricas codificadas")
+            print(f"[DEBUG] Feature importance generated: {metrics['feature_importance']}")
             
-            # Preparar features y target
-            feature_columns = ['edad', 'sexo', 'estado_civil', 'nacionalidad',
-                             'nivel_educativo', 'ingresos_mensuales', 'ocupacion',
-                             'nivel_riesgo_crediticio', 'tarjeta_credito']
+            # Guardar modelo y encoders
+            with self.profiler.phase('save'):
+                self.save_model()
+            print("Modelo guardado")
             
-            X = df_encoded[feature_columns]
-            y = df_encoded['desercion']
+            if self.profiler.enabled:
+                metrics['profiling'] = self.profiler.report()
             
-            self.feature_columns = feature_columns
+            # Guardar métricas y una copia por dataset para que el análisis la reutilice
+            self.write_metrics(metrics)
+            self.save_dataset_artifacts(data_hash, metrics)
+            
+            training_time = time.time() - start_time
+            print(f"Entrenamiento completado en {training_time:.2f} segundos")
+            self.print_metrics(metrics)
+            
+            # Retornar métricas
+            return metrics
+            
+        except Exception as e:
+            print(f"Error al entrenar modelo: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+    
+    def prepare_training_matrix(self, df, feature_columns, y=None):
+        """
+        Ajustar encoders y scaler y devolver (X, y, n_fit, n_train): una matriz float32
+        escrita una sola vez con las filas que entrenan el modelo, las de validación que
+        calibran los umbrales y las de evaluación (ver training_row_order). El DataFrame
+        no se modifica; las etiquetas salen de 'desercion' si no se indican en y.
+        """
+        from sklearn.preprocessing import StandardScaler
+        
+        self.feature_columns = list(feature_columns)
+        y = np.asarray(df['desercion'] if y is None else y, dtype=np.int8)
+        
+        # Partición por índices (misma que sobre el DataFrame) y matriz en ese orden;
+        # los arrays de índices se liberan antes de entrenar
+        rows, n_fit, n_train = training_row_order(y)
+        X = self.build_feature_matrix(df, rows)
+        y = y[rows]
+        del rows
+        print("Variables categóricas codificadas")
+        
+        # Escalar en su sitio: el scaler se ajusta con las filas de entrenamiento
+        numerical = [j for j, col in enumerate(self.feature_columns) if col in NUMERICAL_FEATURES]
+        self.scaler = StandardScaler()
+        self.scaler.fit(X[:n_train, numerical])
+        X[:, numerical] = self.scaler.transform(X[:, numerical])
+        return X, y, n_fit, n_train
+    
+    def fit_dataframe(self, df, feature_columns, y=None):
+        """
+        Codificar, escalar, entrenar y evaluar sobre un DataFrame con columna 'desercion'
+        (o con las etiquetas en y). Las particiones de entrenamiento, validación y
+        evaluación son vistas de la matriz de prepare_training_matrix.
+        """
+        with self.profiler.phase('encode') as encode_phase:
+            X, y, n_fit, n_train = self.prepare_training_matrix(df, feature_columns, y)
+            X_train, X_valid, X_test = X[:n_fit], X[n_fit:n_train], X[n_train:]
+            y_train, y_valid, y_test = y[:n_fit], y[n_fit:n_train], y[n_train:]
+        
+        print(f"Datos escalados, iniciando entrenamiento con {self.n_jobs} hilos...")
+        
+        with self.profiler.phase('fit') as fit_phase:
+            self.model = build_model(self.n_jobs, self.max_bin, self.tuned_params)
+            self.model.fit(X_train, y_train)
+            self.model.get_booster().feature_names = self.feature_columns
+            self.inference_engine = None
+            self.prediction_cache.clear()
+        print("Modelo entrenado")
+        
+        # Evaluar modelo con métricas completas
+        with self.profiler.phase('evaluate') as evaluate_phase:
+            metrics = evaluate_model(self.model, X_test, y_test, X_valid, y_valid)
+            self.thresholds = metrics['threshold_analysis']['thresholds']
+        
+        fit_time = fit_phase.elapsed
+        metrics.update({
+            'data_size': len(y),
+            'test_size': len(y_test),
+            'data_split': {
+                'train_size': len(y_train),
+                'validation_size': len(y_valid),
+                'test_size': len(y_test),
+                'train_churn': int(y_train.sum(dtype=np.int64)),
+                'test_churn': int(y_test.sum(dtype=np.int64))
+            },
+            'feature_columns': self.feature_columns,
+            'model_params': model_params(self.max_bin, self.tuned_params),
+            'throughput': {
+                'threads': self.n_jobs,
+                'fit_rows_per_second': float(len(y_train) / fit_time) if fit_time > 0 else 0.0,
+                'phase_times': {
+                    'encode': float(encode_phase.elapsed),
+                    'fit': float(fit_time),
+                    'evaluate': float(evaluate_phase.elapsed)
+                }
+            },
+            'feature_importance': dict(zip(self.feature_columns, self.model.feature_importances_.tolist()))
+        })
+        return metrics
+    
+    def cross_validate(self, df, feature_columns, folds, y=None):
+        """
+        Validación cruzada estratificada en `folds` particiones con los encoders y el
+        scaler ya ajustados (fit_dataframe). La matriz se escribe una vez en memoria
+        compartida, ordenada por fold, y los folds se entrenan en paralelo en procesos
+        que la leen sin copiarla. El modelo entrenado no se modifica.
+        """
+        self.feature_columns = list(feature_columns)
+        y = np.asarray(df['desercion'] if y is None else y, dtype=np.int8)
+        order, bounds = assign_folds(y, folds)
+        
+        # Hasta un proceso por fold, repartiendo los hilos disponibles entre ellos
+        processes = max(1, min(folds, self.n_jobs))
+        threads_per_fold = max(1, self.n_jobs // processes)
+        model = build_model(threads_per_fold, self.max_bin, self.tuned_params)
+        
+        print(f"[CV] {folds} folds estratificados, {processes} procesos con {threads_per_fold} hilos cada uno")
+        with self.profiler.phase('cross_validation'):
+            with SharedArray((len(y), len(self.feature_columns)), np.float32) as X, \
+                 SharedArray((len(y),), np.int8) as labels:
+                self.build_feature_matrix(df, order, out=X.array)
+                labels.array[:] = y[order]
+                del order
+                
+                # Mismo escalado que el modelo entrenado
+                numerical = [j for j, col in enumerate(self.feature_columns) if col in NUMERICAL_FEATURES]
+                X.array[:, numerical] = self.scaler.transform(X.array[:, numerical])
+                
+                fold_metrics = run_folds(X.spec, labels.spec, bounds, model.get_xgb_params(),
+                                         model.n_estimators, processes)
+        
+        summary = summarize_folds(fold_metrics)
+        for metric in CV_METRICS:
+            print(f"[CV] {metric}: {summary['mean'][metric]:.4f} ± {summary['std'][metric]:.4f}")
+        return summary
+    
+    def iter_clean_chunks(self, csv_path, chunk_rows):
+        """
+        Bloques del dataset sin nulos en las columnas requeridas, con sus máscaras de
+        evaluación y de validación
+        """
+        chunks = iter_dataset_source(csv_path, columns=REQUIRED_COLUMNS, chunksize=chunk_rows)
+        for index, chunk in enumerate(chunks):
+            missing_columns = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+            if missing_columns:
+                raise ValueError(f"Columnas faltantes en el CSV: {missing_columns}")
+            chunk = drop_incomplete_rows(chunk, REQUIRED_COLUMNS)
+            chunk['desercion'] = chunk['fuga'].astype('int8')
+            yield (chunk, *row_masks(len(chunk), index))
+    
+    def fit_external_memory(self, csv_path, feature_columns, chunk_rows=EXTERNAL_CHUNK_ROWS):
+        """
+        Entrenamiento fuera de memoria: una pasada para ajustar encoders y scaler, el
+        entrenamiento sobre un DataIter que codifica y escala cada bloque, y una pasada
+        final que calibra los umbrales con las filas de validación y evalúa las de
+        evaluación acumulando solo etiquetas y probabilidades
+        """
+        from sklearn.preprocessing import LabelEncoder, StandardScaler
+        
+        self.feature_columns = list(feature_columns)
+        numerical_features = [col for col in NUMERICAL_FEATURES if col in feature_columns]
+        print(f"[INFO] Entrenamiento fuera de memoria en bloques de {chunk_rows} filas")
+        
+        # Pasada 1: categorías de todo el dataset y media/varianza de las filas de entrenamiento
+        with self.profiler.phase('scan') as scan_phase:
+            categories = {col: set() for col in CATEGORICAL_COLUMNS if col in feature_columns}
+            self.scaler = StandardScaler()
+            chunks = train_size = train_churn = valid_size = test_size = test_churn = total_churn = 0
+            for chunk, test_mask, valid_mask in self.iter_clean_chunks(csv_path, chunk_rows):
+                chunks += 1
+                for col, seen in categories.items():
+                    seen.update(present_categories(chunk[col]))
+                # El scaler se ajusta con entrenamiento y validación, como en memoria
+                train = chunk[~test_mask]
+                if len(train):
+                    self.scaler.partial_fit(train[numerical_features])
+                fit_mask = ~(test_mask | valid_mask)
+                train_size += int(fit_mask.sum())
+                train_churn += int(chunk['desercion'][fit_mask].sum())
+                valid_size += int(valid_mask.sum())
+                test_size += int(test_mask.sum())
+                test_churn += int(chunk['desercion'][test_mask].sum())
+                total_churn += int(chunk['desercion'].sum())
             
-            # Dividir datos
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            
-            # Escalar características numéricas
-            numerical_features = ['edad', 'ingresos_mensuales']
-            X_train_scaled = X_train.copy()
-            X_test_scaled = X_test.copy()
-            
-            X_train_scaled[numerical_features] = self.scaler.fit_transform(X_train[numerical_features])
-            X_test_scaled[numerical_features] = self.scaler.transform(X_test[numerical_features])
-            
-            print("Datos escalados, iniciando entrenamiento...")
-            
-            # Entrenar modelo XGBoost con configuración ultra-optimizada
-            self.model = xgb.XGBClassifier(
-                n_estimators=20,   # Muy reducido para velocidad
-                max_depth=3,       # Muy reducido para velocidad
-                learning_rate=0.3, # Aumentado para compensar menos estimadores
-                subsample=0.8,
-                colsample_bytree=0.8,
-                random_state=42,
-                verbosity=0,       # Sin output verboso
-                n_jobs=1          # Un solo hilo para evitar overhead
+            if train_size == 0 or test_size == 0:
+                raise ValueError("El dataset no tiene filas suficientes para entrenar y evaluar")
+            self.encoders = {col: LabelEncoder().fit(sorted(seen)) for col, seen in categories.items()}
+            self.encoding_tables = {}
+        
+        data_size = train_size + valid_size + test_size
+        print(f"[INFO] Datos reales recorridos en {chunks} bloques:")
+        print(f"   Total clientes: {data_size}")
+        print(f"   Clientes con fuga: {total_churn}")
+        
+        def train_batches():
+            for chunk, test_mask, valid_mask in self.iter_clean_chunks(csv_path, chunk_rows):
+                train = chunk[~(test_mask | valid_mask)]
+                if len(train):
+                    yield self.prepare_features(train), train['desercion'].to_numpy()
+        
+        print(f"Iniciando entrenamiento fuera de memoria con {self.n_jobs} hilos...")
+        with self.profiler.phase('fit') as fit_phase:
+            self.model = train_external(train_batches, self.n_jobs, self.max_bin, self.tuned_params, self.model_dir)
+            self.inference_engine = None
+            self.prediction_cache.clear()
+        print("Modelo entrenado")
+        
+        # Pasada final: solo etiquetas y probabilidades de las filas reservadas
+        with self.profiler.phase('evaluate') as evaluate_phase:
+            labels, probabilities, valid_labels, valid_probabilities = [], [], [], []
+            for chunk, test_mask, valid_mask in self.iter_clean_chunks(csv_path, chunk_rows):
+                held_out = chunk[test_mask | valid_mask]
+                if len(held_out) == 0:
+                    continue
+                proba = self.model.predict_proba(self.prepare_features(held_out))[:, 1]
+                is_test = test_mask[test_mask | valid_mask]
+                labels.append(held_out['desercion'].to_numpy()[is_test])
+                probabilities.append(proba[is_test])
+                valid_labels.append(held_out['desercion'].to_numpy()[~is_test])
+                valid_probabilities.append(proba[~is_test])
+            labels, probabilities = np.concatenate(labels), np.concatenate(probabilities)
+            valid_labels, valid_probabilities = np.concatenate(valid_labels), np.concatenate(valid_probabilities)
+            metrics = evaluate_predictions(labels, probabilities > DECISION_THRESHOLD, probabilities)
+            metrics['threshold_analysis'] = calibrated_threshold_analysis(
+                labels, probabilities, valid_labels, valid_probabilities
             )
+            self.thresholds = metrics['threshold_analysis']['thresholds']
+        
+        fit_time = fit_phase.elapsed
+        metrics.update({
+            'data_size': data_size,
+            'test_size': test_size,
+            'data_split': {
+                'train_size': train_size,
+                'validation_size': valid_size,
+                'test_size': test_size,
+                'train_churn': train_churn,
+                'test_churn': test_churn
+            },
+            'feature_columns': self.feature_columns,
+            'model_params': model_params(self.max_bin, self.tuned_params),
+            'external_memory': {
+                'chunk_rows': int(chunk_rows),
+                'chunks': chunks,
+                'peak_rss_mb': peak_rss_mb()
+            },
+            'throughput': {
+                'threads': self.n_jobs,
+                'fit_rows_per_second': float(train_size / fit_time) if fit_time > 0 else 0.0,
+                'phase_times': {
+                    'scan': float(scan_phase.elapsed),
+                    'fit': float(fit_time),
+                    'evaluate': float(evaluate_phase.elapsed)
+                }
+            },
+            'feature_importance': dict(zip(self.feature_columns, self.model.feature_importances_.tolist()))
+        })
+        return metrics
+    
+    def update_model(self, csv_path, rounds=UPDATE_ROUNDS):
+        """
+        Actualización incremental: continuar el boosting del modelo guardado solo con los
+        datos nuevos (warm start), ampliando encoders y escalado, y evaluar sobre una
+        porción reservada de esos datos
+        """
+        import pandas as pd
+        
+        try:
+            start_time = time.time()
+            print(f"Iniciando actualización con archivo: {csv_path}")
             
-            self.model.fit(X_train_scaled, y_train)
-            print("Modelo entrenado")
-            
-            # Evaluar modelo con métricas completas
-            from sklearn.metrics import precision_score, recall_score, f1_score, roc_auc_score
-            
-            y_pred = self.model.predict(X_test_scaled)
-            y_proba = self.model.predict_proba(X_test_scaled)[:, 1]
-            
-            # Calcular métricas principales
-            accuracy = accuracy_score(y_test, y_pred)
-            precision = precision_score(y_test, y_pred, zero_division=0)
-            recall = recall_score(y_test, y_pred, zero_division=0)
-            f1 = f1_score(y_test, y_pred, zero_division=0)
-            roc_auc = roc_auc_score(y_test, y_proba)
-            
-            # Matriz de confusión
-            cm = confusion_matrix(y_test, y_pred)
-            tn, fp, fn, tp = cm.ravel() if cm.size == 4 else (0, 0, 0, 0)
-            
-            # Calcular métricas adicionales
-            specificity = tn / (tn + fp) if (tn + fp) > 0 else 0
-            
-            # Obtener classification report
-            class_report = classification_report(y_test, y_pred, output_dict=True, zero_division=0)
-            
-            # Crear diccionario de métricas completo
-            metrics = {
-                'accuracy': float(accuracy),
-                'precision': float(precision),
-                'recall': float(recall),
-                'f1_score': float(f1),
-                'roc_auc': float(roc_auc),
-                'confusion_matrix': {
-                    'true_negative': int(tn),
-                    'false_positive': int(fp),
-                    'false_negative': int(fn),
-                    'true_positive': int(tp)
+            if not self.load_model():
+                print("No hay un modelo entrenado que actualizar; usa 'train'")
+                return False
+            base_version = self.model_version
+            base_trees = self.model.get_booster().num_boosted_rounds()
+            
+            with self.profiler.phase('load') as load_phase:
+                df = self.load_and_preprocess_data(csv_path)
+            if df is None:
+                return False
+            
+            with self.profiler.phase('encode') as encode_phase:
+                # Misma matriz float32 que 'train': filas de entrenamiento, de validación y
+                # de evaluación (partición por índices), sin copiar ni modificar el DataFrame
+                new_categories = self.extend_encoders(df)
+                y = np.asarray(df['desercion'], dtype=np.int8)
+                rows, n_fit, n_train = training_row_order(y)
+                X = self.build_feature_matrix(df, rows)
+                y = y[rows]
+                del rows
+                
+                # Solo las columnas numéricas originales se guardan aparte (dos columnas)
+                numerical_features = [col for col in NUMERICAL_FEATURES if col in self.feature_columns]
+                numerical = [self.feature_columns.index(col) for col in numerical_features]
+                raw = pd.DataFrame(X[:, numerical], columns=numerical_features)
+                
+                # Margen de los árboles existentes con el escalado anterior
+                old_mean, old_scale = self.scaler.mean_.copy(), self.scaler.scale_.copy()
+                X[:, numerical] = self.scaler.transform(raw)
+                base_margin = self.model.get_booster().inplace_predict(X, predict_type='margin')
+                
+                # Actualizar media y varianza con los datos nuevos y reexpresar los
+                # umbrales de los árboles existentes en la nueva escala
+                self.scaler.partial_fit(raw.iloc[:n_train])
+                scalings = {}
+                for i, feature in enumerate(numerical):
+                    scalings[feature] = ((old_mean[i], old_scale[i]), (self.scaler.mean_[i], self.scaler.scale_[i]))
+                base_booster = rescale_numeric_splits(self.model, scalings)
+                X[:, numerical] = self.scaler.transform(raw)
+                del raw
+                
+                # Cambio de los árboles existentes con el nuevo escalado, sobre los datos nuevos
+                drift = np.abs(base_booster.inplace_predict(X, predict_type='margin') - base_margin)
+                del base_margin
+                X_train, X_valid, X_test = X[:n_fit], X[n_fit:n_train], X[n_train:]
+                y_train, y_valid, y_test = y[:n_fit], y[n_fit:n_train], y[n_train:]
+            
+            print(f"Continuando el boosting con {rounds} árboles nuevos sobre {len(y_train)} filas...")
+            with self.profiler.phase('fit') as fit_phase:
+                self.model = build_model(self.n_jobs, self.max_bin, self.tuned_params)
+                self.model.set_params(n_estimators=rounds)
+                # La matriz no lleva nombres: se quitan para continuar y se restauran al final
+                base_booster.feature_names = None
+                self.model.fit(X_train, y_train, xgb_model=base_booster)
+                self.model.get_booster().feature_names = self.feature_columns
+                self.inference_engine = None
+                self.prediction_cache.clear()
+            
+            with self.profiler.phase('evaluate') as evaluate_phase:
+                metrics = evaluate_model(self.model, X_test, y_test, X_valid, y_valid)
+                self.thresholds = metrics['threshold_analysis']['thresholds']
+            
+            with self.profiler.phase('save'):
+                self.save_model()
+            
+            elapsed = time.time() - start_time
+            metrics.update({
+                'data_size': len(df),
+                'test_size': len(y_test),
+                'data_split': {
+                    'train_size': len(y_train),
+                    'validation_size': len(y_valid),
+                    'test_size': len(y_test),
+                    'train_churn': int(y_train.sum(dtype=np.int64)),
+                    'test_churn': int(y_test.sum(dtype=np.int64))
                 },
-                'additional_metrics': {
-                    'specificity': float(specificity),
-                    'sensitivity': float(recall),
-                    'false_positive_rate': float(fp / (fp + tn)) if (fp + tn) > 0 else 0,
-                    'false_negative_rate': float(fn / (fn + tp)) if (fn + tp) > 0 else 0
+                'feature_columns': self.feature_columns,
+                'model_params': model_params(self.max_bin, self.tuned_params),
+                'update': {
+                    'base_version': base_version,
+                    'version': self.model_version,
+                    'added_trees': rounds,
+                    'total_trees': base_trees + rounds,
+                    'new_categories': new_categories,
+                    'scaler_samples_seen': int(np.max(self.scaler.n_samples_seen_)),
+                    # Filas de los datos nuevos cuyo margen con los árboles anteriores cambió al
+                    # reescalar (valores que el nuevo escalado junta en el mismo float32)
+                    'rescale_drift': {
+                        'rows': len(drift),
+                        'changed_rows': int(np.count_nonzero(drift)),
+                        'max_margin_change': float(drift.max()) if len(drift) else 0.0
+                    }
                 },
-                'classification_report': {
-                    '0': {
-                        'precision': float(class_report['0']['precision']),
-                        'recall': float(class_report['0']['recall']),
-                        'f1-score': float(class_report['0']['f1-score'])
-                    },
-                    '1': {
-                        'precision': float(class_report['1']['precision']),
-                        'recall': float(class_report['1']['recall']),
-                        'f1-score': float(class_report['1']['f1-score'])
+                'throughput': {
+                    'threads': self.n_jobs,
+                    'rows_per_second': float(len(df) / elapsed) if elapsed > 0 else 0.0,
+                    'phase_times': {
+                        'load': float(load_phase.elapsed),
+                        'encode': float(encode_phase.elapsed),
+                        'fit': float(fit_phase.elapsed),
+                        'evaluate': float(evaluate_phase.elapsed)
                     }
                 },
-                'training_time': float(time.time() - start_time),
-                'data_size': len(df),
-                'test_size': len(y_test),
-                'feature_importance': dict(zip(feature_columns, self.model.feature_importances_.tolist()))
-            }
+                'feature_importance': dict(zip(self.feature_columns, self.model.feature_importances_.tolist())),
+                'training_time': float(elapsed),
+                'dataset_hash': dataset_hash(csv_path)
+            })
+            if self.profiler.enabled:
+                metrics['profiling'] = self.profiler.report()
             
-            print(f"[DEBUG] Feature importance generated: {metrics['feature_importance']}")
+            self.write_metrics(metrics)
+            print(f"Actualización completada en {elapsed:.2f} segundos (versión {self.model_version})")
+            self.print_metrics(metrics)
+            return metrics
             
-            # Guardar métricas en archivo JSON
-            metrics_path = os.path.join(self.model_dir, 'metrics_report.json')
-            with open(metrics_path, 'w', encoding='utf-8') as f:
-                json.dump(metrics, f, indent=2, ensure_ascii=False)
-            print(f"Metricas guardadas en: {metrics_path}")
+        except Exception as e:
+            print(f"Error al actualizar modelo: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+    
+    def tune_model(self, csv_path, budget_seconds=TUNE_BUDGET_SECONDS, trials=TUNE_TRIALS, workers=None):
+        """
+        Buscar hiperparámetros dentro del presupuesto de tiempo y guardar la mejor
+        configuración en TUNED_PARAMS_FILE, de donde la toman 'train' y el análisis
+        """
+        import xgboost as xgb
+        
+        try:
+            start_time = time.time()
+            print(f"Iniciando búsqueda de hiperparámetros con archivo: {csv_path}")
             
-            # Guardar modelo y encoders
-            self.save_model()
-            print("Modelo guardado")
+            with self.profiler.phase('load'):
+                df = self.load_and_preprocess_data(csv_path)
+            if df is None:
+                return False
             
-            training_time = time.time() - start_time
-            print(f"Entrenamiento completado en {training_time:.2f} segundos")
-            print(f"\n[METRICAS DEL MODELO]")
-            print(f"   Accuracy:  {accuracy*100:.2f}%")
-            print(f"   Precision: {precision*100:.2f}%")
-            print(f"   Recall:    {recall*100:.2f}%")
-            print(f"   F1-Score:  {f1*100:.2f}%")
-            print(f"   ROC-AUC:   {roc_auc*100:.2f}%")
+            # Codificar una sola vez; la validación del early stopping sale de las filas de
+            # entrenamiento (las de evaluación quedan fuera de la búsqueda)
+            with self.profiler.phase('encode'):
+                X, y, _, n_train = self.prepare_training_matrix(df, FEATURE_COLUMNS)
+                fit_rows, valid_rows = split_train_test_indices(y[:n_train])
+                params = model_params(self.max_bin, self.tuned_params)
+                dtrain = xgb.QuantileDMatrix(X[fit_rows], y[fit_rows], feature_names=self.feature_columns,
+                                             max_bin=params['max_bin'], nthread=self.n_jobs)
+                dvalid = xgb.QuantileDMatrix(X[valid_rows], y[valid_rows], feature_names=self.feature_columns,
+                                             ref=dtrain, nthread=self.n_jobs)
+                del X, y, fit_rows, valid_rows
             
-            # Retornar métricas
-            return metrics
+            # Pruebas en paralelo: los hilos se reparten entre ellas
+            workers = resolve_n_jobs(workers)
+            threads_per_trial = max(1, self.n_jobs // workers)
+            base_params = build_model(threads_per_trial, self.max_bin, self.tuned_params).get_xgb_params()
+            print(f"[TUNE] {trials} configuraciones, {budget_seconds:.0f} s, {workers} en paralelo "
+                  f"con {threads_per_trial} hilos cada una")
+            
+            with self.profiler.phase('search') as search_phase:
+                best, trials_run = successive_halving(dtrain, dvalid, base_params, params, budget_seconds,
+                                                      trials, workers)
+            
+            # Referencia: la configuración actual en la primera ronda
+            baseline = next((trial for trial in trials_run if trial['current_config'] and trial['rung'] == 0), None)
+            tuned = dict(best['params'], n_estimators=best['best_iteration'] + 1)
+            result = {
+                'params': tuned,
+                'validation_auc': best['validation_auc'],
+                'baseline_validation_auc': baseline['validation_auc'] if baseline else None,
+                'dataset_hash': dataset_hash(csv_path),
+                'budget_seconds': float(budget_seconds),
+                'search_seconds': float(search_phase.elapsed),
+                'workers': workers,
+                'threads_per_trial': threads_per_trial,
+                'trials': trials_run
+            }
+            
+            write_atomic(os.path.join(self.model_dir, TUNED_PARAMS_FILE),
+                         json.dumps(result, indent=2, ensure_ascii=False).encode('utf-8'))
+            self.tuned_params = tuned
+            
+            elapsed = time.time() - start_time
+            print(f"Búsqueda completada en {elapsed:.2f} segundos ({len(trials_run)} pruebas)")
+            print(f"[TUNE] Mejor AUC de validación: {best['validation_auc']:.4f} con {tuned}")
+            return result
             
         except Exception as e:
-            print(f"Error al entrenar modelo: {str(e)}")
+            print(f"Error en la búsqueda de hiperparámetros: {str(e)}")
             import traceback
             traceback.print_exc()
             return False
     
+    def extend_encoders(self, df):
+        """
+        Añadir al final de cada encoder las categorías nuevas del DataFrame; los códigos
+        existentes no cambian, así que los árboles ya entrenados siguen siendo válidos
+        """
+        new_categories = {}
+        for col, encoder in self.encoders.items():
+            if col not in df.columns:
+                continue
+            known = set(encoder.classes_)
+            unseen = [value for value in present_categories(df[col]) if value not in known]
+            if unseen:
+                encoder.classes_ = np.concatenate([encoder.classes_, np.array(unseen, dtype=object)])
+                self.encoding_tables.pop(col, None)
+                new_categories[col] = unseen
+        return new_categories
+    
+    def print_metrics(self, metrics):
+        """
+        Imprimir las métricas principales del modelo
+        """
+        print(f"\n[METRICAS DEL MODELO]")
+        print(f"   Accuracy:  {metrics['accuracy']*100:.2f}%")
+        print(f"   Precision: {metrics['precision']*100:.2f}%")
+        print(f"   Recall:    {metrics['recall']*100:.2f}%")
+        print(f"   F1-Score:  {metrics['f1_score']*100:.2f}%")
+        print(f"   ROC-AUC:   {metrics['roc_auc']*100:.2f}%")
+        thresholds = metrics.get('threshold_analysis', {}).get('thresholds')
+        if thresholds:
+            print(f"   Umbrales:  decisión {thresholds['decision']:.4f}, "
+                  f"riesgo alto {thresholds['risk_high']:.4f}, riesgo medio {thresholds['risk_medium']:.4f}")
+            deployed = metrics['threshold_analysis'].get('test_at_thresholds')
+            if deployed:
+                print(f"   Test con umbral desplegado: precisión {deployed['precision']:.4f}, "
+                      f"recall {deployed['recall']:.4f}, F1 {deployed['f1_score']:.4f}")
+    
+    def write_metrics(self, metrics, model_dir=None):
+        """
+        Guardar métricas en archivo JSON
+        """
+        metrics_path = os.path.join(model_dir or self.model_dir, 'metrics_report.json')
+        with open(metrics_path, 'w', encoding='utf-8') as f:
+            json.dump(metrics, f, indent=2, ensure_ascii=False)
+        print(f"Metricas guardadas en: {metrics_path}")
+    
+    def save_dataset_artifacts(self, data_hash, metrics):
+        """
+        Guardar modelo y métricas en el directorio del dataset (ml_models/datasets/<hash>)
+        """
+        artifacts_dir = dataset_artifacts_dir(self.model_dir, data_hash)
+        os.makedirs(artifacts_dir, exist_ok=True)
+        self.save_model(artifacts_dir, keep_versions=0)
+        self.write_metrics(metrics, artifacts_dir)
+        return artifacts_dir
+    
+    def load_dataset_metrics(self, data_hash):
+        """
+        Métricas del modelo ya entrenado para este dataset, si existe
+        """
+        return load_dataset_metrics(self.model_dir, data_hash, MODEL_FILES, model_params(self.max_bin, self.tuned_params))
+    
+    def adopt_dataset_model(self, data_hash, cv_folds=None):
+        """
+        Publicar como modelo activo el entrenado previamente en memoria para este dataset
+        (si se pide validación cruzada, solo cuando sus métricas ya la incluyen)
+        """
+        metrics = self.load_dataset_metrics(data_hash)
+        if metrics is None or 'external_memory' in metrics or not has_cross_validation(metrics, cv_folds):
+            return None
+        
+        artifacts_dir = dataset_artifacts_dir(self.model_dir, data_hash)
+        if not self.load_model(artifacts_dir):
+            return None
+        
+        # Publicar como una versión nueva del modelo activo
+        self.save_model()
+        self.write_metrics(metrics)
+        return metrics
+    
+    def prepare_features(self, df):
+        """
+        Codificar y escalar un DataFrame de clientes para inferencia
+        """
+        df_encoded = self.encode_categorical_features(df)
+        X_scaled = df_encoded[self.feature_columns].copy()
+        
+        numerical_features = [col for col in NUMERICAL_FEATURES if col in self.feature_columns]
+        X_scaled[numerical_features] = self.scaler.transform(X_scaled[numerical_features])
+        return X_scaled
+    
     def predict_single(self, customer_data):
         """
         Realizar predicción para un cliente individual
@@ -244,76 +809,246 @@ class CustomerChurnPredictor:
             if self.model is None:
                 self.load_model()
             
-            # Crear DataFrame con los datos del cliente
-            df = pd.DataFrame([customer_data])
+            # Las features normalizadas (codificadas y escaladas) y la versión forman la clave
+            engine = self.get_inference_engine()
+            row = engine.fill_row(customer_data)
+            cache_key = (self.model_version, row.tobytes())
+            result = self.prediction_cache.get(cache_key)
             
-            # Codificar variables categóricas
-            df_encoded = self.encode_categorical_features(df)
+            if result is None:
+                # Una sola inferencia sobre el booster nativo: la etiqueta se deriva de la probabilidad
+                result = prediction_result(engine.predict_filled_row(), self.thresholds)
+                self.prediction_cache.put(cache_key, result)
             
-            # Preparar features
-            X = df_encoded[self.feature_columns]
+            return dict(result)
             
-            # Escalar características numéricas
-            numerical_features = ['edad', 'ingresos_mensuales']
-            X_scaled = X.copy()
-            X_scaled[numerical_features] = self.scaler.transform(X[numerical_features])
+        except Exception as e:
+            print(f"Error al predecir: {str(e)}")
+            return None
+    
+    def predict_many(self, customers):
+        """
+        Predicción de varios clientes con una sola inferencia para los que no están en caché.
+        Devuelve un resultado por cliente (None para los que no se pudieron puntuar).
+        """
+        if self.model is None:
+            self.load_model()
+        
+        engine = self.get_inference_engine()
+        X = np.empty((len(customers), len(engine.feature_columns)), dtype=np.float32)
+        results = [None] * len(customers)
+        pending = []
+        
+        for i, customer_data in enumerate(customers):
+            try:
+                engine.fill_row(customer_data, X[i])
+            except Exception as e:
+                print(f"Error al predecir: {str(e)}")
+                continue
             
-            # Realizar predicción
-            prediction = self.model.predict(X_scaled)[0]
-            probability = self.model.predict_proba(X_scaled)[0][1]
+            cache_key = (self.model_version, X[i].tobytes())
+            cached = self.prediction_cache.get(cache_key)
+            if cached is not None:
+                results[i] = dict(cached)
+            else:
+                pending.append((i, cache_key))
+        
+        if pending:
+            rows = [i for i, _ in pending]
+            probabilities = engine.predict_rows(X[rows])
+            for (i, cache_key), probability in zip(pending, probabilities):
+                result = prediction_result(float(probability), self.thresholds)
+                self.prediction_cache.put(cache_key, result)
+                results[i] = dict(result)
+        
+        return results
+    
+    def get_inference_engine(self):
+        """
+        Motor de inferencia individual del modelo actual (se reconstruye al cambiar el modelo)
+        """
+        if self.inference_engine is None:
+            self.inference_engine = InferenceEngine(self.model, self.encoders, self.scaler,
+                                                    self.feature_columns, NUMERICAL_FEATURES)
+        return self.inference_engine
+    
+    def predict_single_numpy(self, customer_data):
+        """
+        Predicción individual con el evaluador NumPy leído de la cabecera del bundle,
+        sin importar pandas, sklearn ni xgboost. None si el bundle no lo permite o si
+        la entrada no es un objeto JSON (predict_single da entonces el error).
+        """
+        if not isinstance(customer_data, dict):
+            return None
+        try:
+            scorer = TreeEnsembleScorer.from_bundle(os.path.join(self.model_dir, BUNDLE_FILE))
+            probability = float(scorer.predict_proba(scorer.transform([customer_data]))[0])
+        except (OSError, ValueError, TypeError):
+            return None
+        
+        return prediction_result(probability, scorer.thresholds or DEFAULT_THRESHOLDS)
+    
+    def predict_batch(self, input_csv, output_csv, chunksize=BATCH_CHUNK_SIZE, workers=1):
+        """
+        Puntuar un CSV completo de clientes por bloques y escribir los resultados en streaming.
+        La memoria usada depende del tamaño de bloque, no del tamaño del archivo.
+        Con workers > 1 el archivo se reparte entre procesos (ver predict_batch_parallel).
+        """
+        try:
+            start_time = time.time()
+            if workers > 1:
+                total_rows, total_churn = self.predict_batch_parallel(input_csv, output_csv, chunksize, workers)
+            else:
+                if self.model is None and not self.load_model():
+                    return None
+                with open(output_csv, 'w', encoding='utf-8', newline='') as out:
+                    total_rows, total_churn = self.score_csv(input_csv, out, chunksize)
             
+            elapsed = time.time() - start_time
             return {
-                'desercion_predicha': int(prediction),
-                'probabilidad_desercion': float(probability),
-                'riesgo': 'Alto' if probability > 0.7 else 'Medio' if probability > 0.4 else 'Bajo'
+                'archivo_salida': output_csv,
+                'total_clientes': total_rows,
+                'desercion_predicha': total_churn,
+                'procesos': workers,
+                'tiempo_segundos': float(elapsed),
+                'filas_por_segundo': float(total_rows / elapsed) if elapsed > 0 else 0.0
             }
             
         except Exception as e:
-            print(f"Error al predecir: {str(e)}")
+            print(f"Error en la predicción por lotes: {str(e)}")
+            import traceback
+            traceback.print_exc()
             return None
     
-    def save_model(self):
+    def score_csv(self, source, out, chunksize=BATCH_CHUNK_SIZE, header=True, progress=True):
         """
-        Guardar modelo y encoders - versión optimizada
+        Puntuar un CSV (ruta o archivo en memoria) por bloques escribiendo en out.
+        Devuelve (clientes puntuados, deserciones predichas).
         """
-        try:
-            # Guardar modelo
-            with open(f'{self.model_dir}/xgboost_model.pkl', 'wb') as f:
-                pickle.dump(self.model, f)
+        import pandas as pd
+        
+        total_rows = 0
+        total_churn = 0
+        
+        # Leer solo las columnas necesarias para puntuar
+        needed_columns = list(self.feature_columns) + ['ClienteID']
+        for chunk in iter_dataset_chunks(source, columns=needed_columns, chunksize=chunksize):
+            X_scaled = self.prepare_features(chunk)
+            probabilities = self.model.predict_proba(X_scaled)[:, 1]
+            predictions = (probabilities > self.thresholds['decision']).astype(np.int8)
             
-            # Guardar encoders
-            with open(f'{self.model_dir}/encoders.pkl', 'wb') as f:
-                pickle.dump(self.encoders, f)
+            result = pd.DataFrame({
+                'desercion_predicha': predictions,
+                'probabilidad_desercion': probabilities,
+                'riesgo': risk_band_array(probabilities, self.thresholds)
+            })
+            if 'ClienteID' in chunk.columns:
+                result.insert(0, 'ClienteID', chunk['ClienteID'].to_numpy())
             
-            # Guardar scaler
-            with open(f'{self.model_dir}/scaler.pkl', 'wb') as f:
-                pickle.dump(self.scaler, f)
+            result.to_csv(out, header=header, index=False)
+            header = False
             
-            # Guardar feature columns
-            with open(f'{self.model_dir}/feature_columns.pkl', 'wb') as f:
-                pickle.dump(self.feature_columns, f)
+            total_rows += len(result)
+            total_churn += int(predictions.sum())
+            if progress:
+                print(f"[INFO] Clientes puntuados: {total_rows}")
+        
+        return total_rows, total_churn
+    
+    def predict_batch_parallel(self, input_csv, output_csv, chunksize, workers):
+        """
+        Repartir el CSV en rangos de bytes entre un pool de procesos. Cada proceso carga
+        el bundle una sola vez, lee y puntúa sus rangos y escribe un fragmento; los
+        fragmentos se concatenan en orden en el archivo de salida.
+        """
+        import multiprocessing
+        import shutil
+        import tempfile
+        
+        if not os.path.exists(os.path.join(self.model_dir, BUNDLE_FILE)):
+            raise FileNotFoundError("Modelo no encontrado; entrena antes de puntuar")
+        
+        header, ranges = split_csv_ranges(input_csv, workers * BATCH_RANGES_PER_WORKER)
+        shard_dir = tempfile.mkdtemp(prefix='.shards-', dir=os.path.dirname(os.path.abspath(output_csv)))
+        tasks = [(input_csv, header, start, end, os.path.join(shard_dir, f'{i:05d}.csv'), chunksize, i == 0)
+                 for i, (start, end) in enumerate(ranges)]
+        
+        total_rows = 0
+        total_churn = 0
+        try:
+            # 'spawn': los procesos no heredan el estado de OpenMP del padre
+            context = multiprocessing.get_context('spawn')
+            with context.Pool(workers, initializer=init_batch_worker, initargs=(self.model_dir,)) as pool, \
+                    open(output_csv, 'wb') as out:
+                # imap devuelve en orden: cada fragmento se añade en cuanto le toca
+                for shard_path, rows, churn in pool.imap(score_csv_range, tasks):
+                    with open(shard_path, 'rb') as shard:
+                        shutil.copyfileobj(shard, out)
+                    os.remove(shard_path)
+                    total_rows += rows
+                    total_churn += churn
+                    print(f"[INFO] Clientes puntuados: {total_rows}")
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+        
+        return total_rows, total_churn
+    
+    def save_model(self, model_dir=None, keep_versions=DEFAULT_KEEP_VERSIONS):
+        """
+        Guardar modelo, encoders, scaler y columnas en un único bundle versionado,
+        escrito de forma atómica
+        """
+        import xgboost as xgb
+        
+        model_dir = model_dir or self.model_dir
+        try:
+            metadata = {
+                'model_params': model_params(self.max_bin, self.tuned_params),
+                'xgboost_version': xgb.__version__,
+                # Árboles aplanados para el evaluador NumPy (tree_scorer.py)
+                'tree_ensemble': export_tree_ensemble(self.model),
+                'thresholds': self.thresholds
+            }
+            scaler_columns = [col for col in NUMERICAL_FEATURES if col in self.feature_columns]
+            self.model_version = save_versioned(model_dir, self.model, self.encoders, self.scaler,
+                                                self.feature_columns, scaler_columns, metadata, keep_versions)
+            self.prediction_cache.clear()
+            print(f"[INFO] Modelo guardado como versión {self.model_version}")
+            return self.model_version
                 
         except Exception as e:
             print(f"Error al guardar modelo: {str(e)}")
             raise
     
-    def load_model(self):
+    def load_model(self, model_dir=None):
         """
-        Cargar modelo y encoders - versión optimizada
+        Cargar el bundle del modelo con una sola lectura (o los pickles del formato anterior)
         """
+        model_dir = model_dir or self.model_dir
         try:
-            with open(f'{self.model_dir}/xgboost_model.pkl', 'rb') as f:
-                self.model = pickle.load(f)
-            
-            with open(f'{self.model_dir}/encoders.pkl', 'rb') as f:
-                self.encoders = pickle.load(f)
+            signature = self.get_model_signature()
+            bundle_path = os.path.join(model_dir, BUNDLE_FILE)
             
-            with open(f'{self.model_dir}/scaler.pkl', 'rb') as f:
-                self.scaler = pickle.load(f)
-            
-            with open(f'{self.model_dir}/feature_columns.pkl', 'rb') as f:
-                self.feature_columns = pickle.load(f)
+            # Cargar en variables locales para no dejar el predictor a medio actualizar
+            if os.path.exists(bundle_path):
+                model, encoders, scaler, feature_columns, metadata = read_bundle(bundle_path)
+                version = metadata.get('version')
+                thresholds = metadata.get('thresholds') or DEFAULT_THRESHOLDS
+            else:
+                model, encoders, scaler, feature_columns = self.load_legacy_model(model_dir)
+                version = None
+                thresholds = DEFAULT_THRESHOLDS
             
+            self.model = model
+            self.encoders = encoders
+            self.encoding_tables = {}
+            self.scaler = scaler
+            self.feature_columns = feature_columns
+            self.thresholds = dict(thresholds)
+            self.model_version = version
+            self.model_signature = signature
+            self.inference_engine = None
+            self.prediction_cache.clear()
             return True
         except FileNotFoundError:
             print("Archivos del modelo no encontrados")
@@ -321,22 +1056,351 @@ class CustomerChurnPredictor:
         except Exception as e:
             print(f"Error al cargar modelo: {str(e)}")
             return False
+    
+    def load_legacy_model(self, model_dir):
+        """
+        Cargar un modelo guardado en pickles separados (formato anterior al bundle)
+        """
+        loaded = []
+        for file_name in LEGACY_MODEL_FILES:
+            with open(os.path.join(model_dir, file_name), 'rb') as f:
+                loaded.append(pickle.load(f))
+        return tuple(loaded)
+    
+    def get_model_signature(self):
+        """
+        Firma (mtime, tamaño) de los artefactos del modelo para detectar re-entrenamientos
+        """
+        signature = []
+        for file_name in MODEL_FILES:
+            try:
+                stat = os.stat(os.path.join(self.model_dir, file_name))
+                signature.append((file_name, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append((file_name, None, None))
+        return tuple(signature)
+    
+    def reload_if_changed(self):
+        """
+        Recargar el modelo si los archivos en ml_models/ cambiaron (p. ej. tras un 'train')
+        """
+        signature = self.get_model_signature()
+        if self.model is not None and signature == self.model_signature:
+            return False
+        
+        # Si la recarga falla (archivos a medio escribir) se conserva el modelo anterior
+        if self.load_model():
+            print(f"[INFO] Modelo (re)cargado desde: {self.model_dir}")
+            return True
+        return False
+
+# Predictor de cada proceso del pool de 'predict-batch --workers'
+_batch_worker_predictor = None
+
+def has_cross_validation(metrics, cv_folds):
+    """Si las métricas incluyen la validación cruzada pedida (o no se pidió ninguna)"""
+    return not cv_folds or metrics.get('cross_validation', {}).get('folds') == cv_folds
+
+def init_batch_worker(model_dir):
+    """
+    Inicializador del pool: cargar el bundle una sola vez por proceso
+    """
+    global _batch_worker_predictor
+    with contextlib.redirect_stdout(sys.stderr):
+        predictor = CustomerChurnPredictor(n_jobs=1)
+        if not predictor.load_model(model_dir):
+            raise RuntimeError(f"No se pudo cargar el modelo desde {model_dir}")
+    # Un hilo por proceso: el paralelismo lo dan los procesos
+    predictor.model.set_params(n_jobs=1)
+    _batch_worker_predictor = predictor
+
+def score_csv_range(task):
+    """
+    Tarea del pool: puntuar un rango de bytes del CSV y escribir su fragmento de salida
+    """
+    input_csv, header, start, end, shard_path, chunksize, write_header = task
+    source = read_csv_range(input_csv, header, start, end)
+    with open(shard_path, 'w', encoding='utf-8', newline='') as out:
+        rows, churn = _batch_worker_predictor.score_csv(source, out, chunksize, header=write_header,
+                                                        progress=False)
+    return shard_path, rows, churn
+
+def risk_band(probability, thresholds=DEFAULT_THRESHOLDS):
+    """
+    Banda de riesgo para una probabilidad de deserción
+    """
+    if probability > thresholds['risk_high']:
+        return 'Alto'
+    if probability > thresholds['risk_medium']:
+        return 'Medio'
+    return 'Bajo'
+
+def prediction_result(probability, thresholds=DEFAULT_THRESHOLDS):
+    """
+    Respuesta de una predicción individual: etiqueta, probabilidad y banda de riesgo
+    según los umbrales del modelo
+    """
+    return {
+        'desercion_predicha': int(probability > thresholds['decision']),
+        'probabilidad_desercion': probability,
+        'riesgo': risk_band(probability, thresholds)
+    }
+
+def risk_band_array(probabilities, thresholds=DEFAULT_THRESHOLDS):
+    """
+    Bandas de riesgo vectorizadas para un arreglo de probabilidades
+    """
+    return np.select(
+        [probabilities > thresholds['risk_high'], probabilities > thresholds['risk_medium']],
+        ['Alto', 'Medio'],
+        default='Bajo'
+    )
+
+def parse_serve_request(line):
+    """
+    Interpretar una línea JSON del protocolo de 'serve': (datos, None) o (None, error)
+    """
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, {'error': f'JSON inválido: {str(e)}'}
+
+def is_stats_request(data):
+    """Petición de monitorización: {"comando": "estadisticas"}"""
+    return isinstance(data, dict) and data.get('comando') == 'estadisticas'
+
+def serve_stats(predictor, scheduler=None):
+    """
+    Contadores del servidor: versión del modelo, caché de predicciones y micro-lotes
+    """
+    stats = {
+        'version_modelo': predictor.model_version,
+        'cache_predicciones': predictor.prediction_cache.stats()
+    }
+    if scheduler is not None:
+        stats['micro_lotes'] = scheduler.stats()
+    return stats
+
+def score_serve_requests(predictor, lock, customers):
+    """
+    Puntuar peticiones de 'serve' bajo el lock, recargando el modelo si cambió en disco
+    """
+    with lock:
+        predictor.reload_if_changed()
+        if predictor.model is None:
+            return [{'error': 'Modelo no disponible'}] * len(customers)
+        if len(customers) == 1:
+            results = [predictor.predict_single(customers[0])]
+        else:
+            results = predictor.predict_many(customers)
+    
+    return [result if result is not None else {'error': 'Error en la predicción'} for result in results]
+
+def handle_serve_request(predictor, lock, line):
+    """
+    Procesar una línea JSON del protocolo de 'serve' y devolver la respuesta en JSON
+    """
+    customer_data, response = parse_serve_request(line)
+    if response is None:
+        if is_stats_request(customer_data):
+            response = serve_stats(predictor)
+        else:
+            response = score_serve_requests(predictor, lock, [customer_data])[0]
+    return json.dumps(response)
+
+async def serve_micro_batched(predictor, lock, port, scheduler_options):
+    """
+    Servidor TCP asyncio: las peticiones concurrentes (de una o varias conexiones) se
+    agrupan en micro-lotes. Cada conexión recibe sus respuestas en el orden de envío.
+    """
+    import asyncio
+    from micro_batching import MicroBatchScheduler
+    
+    scheduler = MicroBatchScheduler(lambda customers: score_serve_requests(predictor, lock, customers),
+                                    **scheduler_options)
+    scheduler.start()
+    
+    async def respond(line):
+        customer_data, error = parse_serve_request(line)
+        if error is not None:
+            return error
+        if is_stats_request(customer_data):
+            return serve_stats(predictor, scheduler)
+        try:
+            return await scheduler.submit(customer_data)
+        except asyncio.QueueFull:
+            return {'error': 'Servidor saturado, reintente más tarde'}
+        except Exception as e:
+            # Mismo error que el servidor por stdin: la conexión sigue respondiendo
+            print(f"Error al predecir: {str(e)}")
+            return {'error': 'Error en la predicción'}
+    
+    async def handle_connection(reader, writer):
+        # Las respuestas se escriben en orden aunque los lotes terminen en otro orden
+        responses = asyncio.Queue()
+        # Backpressure: con max_inflight peticiones sin responder se deja de leer la conexión
+        inflight = asyncio.Semaphore(scheduler.max_inflight)
+        
+        async def write_responses():
+            while True:
+                task = await responses.get()
+                if task is None:
+                    return
+                writer.write((json.dumps(await task) + '\n').encode('utf-8'))
+                await writer.drain()
+                inflight.release()
+        
+        writer_task = asyncio.create_task(write_responses())
+        try:
+            async for raw_line in reader:
+                line = raw_line.decode('utf-8').strip()
+                if not line:
+                    continue
+                # Esperar un hueco salvo que la escritura haya terminado (cliente desconectado)
+                slot = asyncio.ensure_future(inflight.acquire())
+                await asyncio.wait({slot, writer_task}, return_when=asyncio.FIRST_COMPLETED)
+                if not slot.done():
+                    slot.cancel()
+                    break
+                await responses.put(asyncio.create_task(respond(line)))
+        finally:
+            await responses.put(None)
+            await writer_task
+            writer.close()
+    
+    server = await asyncio.start_server(handle_connection, '127.0.0.1', port)
+    print(f"[INFO] Servidor de predicción escuchando en 127.0.0.1:{port} (JSON-lines, micro-lotes: "
+          f"{scheduler.max_batch_size} filas / {scheduler.max_wait * 1000:g} ms)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await scheduler.stop()
+
+def serve(port=None, scheduler_options=None):
+    """
+    Servidor de predicción persistente: carga el modelo una sola vez y atiende
+    peticiones JSON-lines (un cliente por línea, una respuesta por línea) por
+    stdin/stdout o, si se indica puerto, por un socket TCP local. Con
+    scheduler_options (solo TCP) las peticiones concurrentes se puntúan en
+    micro-lotes. La línea {"comando": "estadisticas"} devuelve los contadores.
+    """
+    protocol_out = sys.stdout
+    lock = threading.Lock()
+    
+    # Los mensajes informativos van a stderr para no mezclarse con las respuestas
+    with contextlib.redirect_stdout(sys.stderr):
+        predictor = CustomerChurnPredictor()
+        predictor.reload_if_changed()
+        
+        if port is None:
+            print("[INFO] Servidor de predicción escuchando en stdin (JSON-lines)")
+            for line in sys.stdin:
+                line = line.strip()
+                if not line:
+                    continue
+                protocol_out.write(handle_serve_request(predictor, lock, line) + '\n')
+                protocol_out.flush()
+            return
+        
+        if scheduler_options is not None:
+            import asyncio
+            try:
+                asyncio.run(serve_micro_batched(predictor, lock, port, scheduler_options))
+            except KeyboardInterrupt:
+                pass
+            return
+        
+        import socketserver
+        
+        class PredictionHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw_line in self.rfile:
+                    line = raw_line.decode('utf-8').strip()
+                    if not line:
+                        continue
+                    response = handle_serve_request(predictor, lock, line)
+                    self.wfile.write((response + '\n').encode('utf-8'))
+                    self.wfile.flush()
+        
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        with socketserver.ThreadingTCPServer(('127.0.0.1', port), PredictionHandler) as server:
+            print(f"[INFO] Servidor de predicción escuchando en 127.0.0.1:{port} (JSON-lines)")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+def parse_options(args):
+    """
+    Separar argumentos posicionales y opciones '--nombre valor'
+    """
+    positional = []
+    options = {}
+    i = 0
+    while i < len(args):
+        if args[i].startswith('--'):
+            if i + 1 >= len(args):
+                raise ValueError(f"Falta el valor de la opción {args[i]}")
+            options[args[i][2:]] = args[i + 1]
+            i += 2
+        else:
+            positional.append(args[i])
+            i += 1
+    return positional, options
 
 def main():
     if len(sys.argv) < 2:
         print("Uso: python xgboost_churn.py <comando> [argumentos]")
         sys.exit(1)
     
-    predictor = CustomerChurnPredictor()
     command = sys.argv[1]
+    try:
+        args, options = parse_options(sys.argv[2:])
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
+    
+    if command == 'serve':
+        port = int(options['port']) if 'port' in options else None
+        
+        # Micro-lotes: --batch-window-ms W [--max-batch N] [--max-queue Q] [--max-inflight C]
+        scheduler_options = None
+        if 'batch-window-ms' in options:
+            if port is None:
+                print("Los micro-lotes requieren --port")
+                sys.exit(1)
+            scheduler_options = {'max_wait_ms': float(options['batch-window-ms'])}
+            if 'max-batch' in options:
+                scheduler_options['max_batch_size'] = int(options['max-batch'])
+            if 'max-queue' in options:
+                scheduler_options['max_queue_depth'] = int(options['max-queue'])
+            if 'max-inflight' in options:
+                scheduler_options['max_inflight'] = int(options['max-inflight'])
+        
+        serve(port, scheduler_options)
+        return
+    
+    predictor = CustomerChurnPredictor(n_jobs=options.get('threads'), max_bin=options.get('max-bin'),
+                                       profiler=Profiler(options.get('profile')))
     
     if command == 'train':
-        if len(sys.argv) < 3:
-            print("Uso: python xgboost_churn.py train <csv_path>")
+        if len(args) < 1:
+            print("Uso: python xgboost_churn.py train <csv_path> [--threads N|auto] [--max-bin B] [--profile off|time|memory] [--external-memory FILAS|auto] [--cv K]")
             sys.exit(1)
         
-        csv_path = sys.argv[2]
-        result = predictor.train_model(csv_path)
+        csv_path = args[0]
+        # Fuera de memoria: --external-memory con las filas por bloque ('auto' = por defecto)
+        external_chunk_rows = None
+        if 'external-memory' in options:
+            value = options['external-memory']
+            external_chunk_rows = EXTERNAL_CHUNK_ROWS if value == 'auto' else int(value)
+        # Validación cruzada: --cv con el número de folds (requiere el dataset en memoria)
+        cv_folds = int(options['cv']) if 'cv' in options else None
+        if cv_folds is not None and (cv_folds < 2 or external_chunk_rows):
+            print("--cv requiere al menos 2 folds y no se combina con --external-memory")
+            sys.exit(1)
+        result = predictor.train_model(csv_path, external_chunk_rows, cv_folds)
         
         if result:
             print(json.dumps(result, indent=2))
@@ -344,13 +1408,41 @@ def main():
             print("Error en el entrenamiento")
             sys.exit(1)
     
+    elif command == 'update':
+        if len(args) < 1:
+            print("Uso: python xgboost_churn.py update <csv_path> [--rounds N] [--threads N|auto] [--max-bin B]")
+            sys.exit(1)
+        
+        result = predictor.update_model(args[0], int(options.get('rounds', UPDATE_ROUNDS)))
+        
+        if result:
+            print(json.dumps(result, indent=2))
+        else:
+            print("Error en la actualización")
+            sys.exit(1)
+    
+    elif command == 'tune':
+        if len(args) < 1:
+            print("Uso: python xgboost_churn.py tune <csv_path> [--budget SEGUNDOS] [--trials N] [--workers N|auto] [--threads N|auto]")
+            sys.exit(1)
+        
+        result = predictor.tune_model(args[0], float(options.get('budget', TUNE_BUDGET_SECONDS)),
+                                      int(options.get('trials', TUNE_TRIALS)), options.get('workers'))
+        
+        if result:
+            print(json.dumps({key: value for key, value in result.items() if key != 'trials'}, indent=2))
+        else:
+            print("Error en la búsqueda de hiperparámetros")
+            sys.exit(1)
+    
     elif command == 'predict':
-        if len(sys.argv) < 3:
+        if len(args) < 1:
             print("Uso: python xgboost_churn.py predict <json_data>")
             sys.exit(1)
         
-        customer_data = json.loads(sys.argv[2])
-        result = predictor.predict_single(customer_data)
+        customer_data = json.loads(args[0])
+        # Arranque rápido con el evaluador NumPy; el predictor completo queda como respaldo
+        result = predictor.predict_single_numpy(customer_data) or predictor.predict_single(customer_data)
         
         if result:
             print(json.dumps(result, indent=2))
@@ -358,8 +1450,30 @@ def main():
             print("Error en la predicción")
             sys.exit(1)
     
+    elif command == 'predict-batch':
+        if len(args) < 2:
+            print("Uso: python xgboost_churn.py predict-batch <input_csv> <output_csv> [--workers N|auto]")
+            sys.exit(1)
+        
+        workers = resolve_n_jobs(options['workers']) if 'workers' in options else 1
+        result = predictor.predict_batch(args[0], args[1], workers=workers)
+        
+        if result:
+            print(json.dumps(result, indent=2))
+        else:
+            print("Error en la predicción por lotes")
+            sys.exit(1)
+    
+    elif command == 'rollback':
+        try:
+            version = rollback(predictor.model_dir, args[0] if args else None)
+        except (OSError, ValueError) as e:
+            print(json.dumps({'error': f'Error en el rollback: {str(e)}'}, ensure_ascii=False))
+            sys.exit(1)
+        print(json.dumps({'version_activa': version}, indent=2))
+    
     else:
-        print("Comando no reconocido. Usa 'train' o 'predict'")
+        print("Comando no reconocido. Usa 'train', 'update', 'tune', 'predict', 'predict-batch', 'serve' o 'rollback'")
         sys.exit(1)
 
 if __name__ == '__main__':
@@ -847,13 +847,15 @@ app.post('/api/ml/train', verifyToken, upload.single('csvFile'), async (req, res
           fs.mkdirSync(destModelPath, { recursive: true });
         }
 
-        // Copiar archivos del modelo
-        const modelFiles = ['xgboost_model.pkl', 'encoders.pkl', 'scaler.pkl', 'feature_columns.pkl', 'metrics_report.json'];
+        // Copiar archivos del modelo (copia temporal + rename: nunca queda un archivo a medias)
+        const modelFiles = ['churn_model.bundle', 'metrics_report.json'];
         modelFiles.forEach(file => {
           const src = path.join(sourceModelPath, file);
           const dest = path.join(destModelPath, file);
           if (fs.existsSync(src)) {
-            fs.copyFileSync(src, dest);
+            const tmpDest = `${dest}.${process.pid}.tmp`;
+            fs.copyFileSync(src, tmpDest);
+            fs.renameSync(tmpDest, dest);
             console.log(`📦 [MODELO] Copiado: ${file}`);
             
             // Debug especial para metrics_report.json
@@ -1457,7 +1459,7 @@ async function startServer() {
             const metrics = JSON.parse(fs.readFileSync(metricsPath, 'utf8'));
             
             // Agregar información de estado del modelo
-            const modelPath = path.join(__dirname, 'ml_models', 'xgboost_model.pkl');
+            const modelPath = path.join(__dirname, 'ml_models', 'churn_model.bundle');
             const modelExists = fs.existsSync(modelPath);
             
             res.json({
@@ -23,6 +23,9 @@ pip install scikit-learn==1.3.0
 Write-Host "Instalando XGBoost..." -ForegroundColor Yellow
 pip install xgboost==1.7.6
 
+Write-Host "Instalando pyarrow (caché columnar de datasets)..." -ForegroundColor Yellow
+pip install pyarrow==14.0.2
+
 Write-Host "Instalando matplotlib..." -ForegroundColor Yellow
 pip install matplotlib==3.7.2
 